@@ -4,27 +4,40 @@ Course Search and Recommendation API
 FastAPI service for semantic course search and intelligent scheduling
 """
 
+import asyncio
+import functools
 import re
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Union
 from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient, models
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+import httpx
+from qdrant_client import AsyncQdrantClient, models
 import uvicorn
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from database.config import collection_names, weights
+from database.timeslots import slot_mask, course_slot_mask
+from database.config import (
+    collection_name, vector_names, weights, model_name, embedding_backend, quantized_model_dir
+)
+from database.query_model import load_query_model, uses_quantized_export
 
 
 # Pydantic models for API
-class TimeSlotItem(BaseModel):
+class APIModel(BaseModel):
+    # Unknown fields are dropped instead of stored; assignments are not re-validated
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+
+
+class TimeSlotItem(APIModel):
     weekday: int
     period: str
     classroom: str
 
-class CourseResponse(BaseModel):
+class CourseResponse(APIModel):
     name: str
     identifier: str
     code: str
@@ -43,45 +56,98 @@ class CourseResponse(BaseModel):
     original_json_string: Optional[str] = None
 
 
-class ScheduleRequest(BaseModel):
+class ScheduleRequest(APIModel):
     course_codes: List[str]  # Using course codes instead of IDs
     max_credits: int = 18
 
 
-class ScheduleResponse(BaseModel):
+class ScheduleResponse(APIModel):
     courses: List[CourseResponse]
     total_credits: int
     conflicts: List[str]
     success: bool
 
 
-class RecommendationRequest(BaseModel):
+class BatchSearchRequest(APIModel):
+    queries: List[str]
+    semesters: Optional[List[str]] = None
+    departments: Optional[List[str]] = None
+    top_k: int = 10
+    ef: Optional[int] = None
+
+
+class RecommendationRequest(APIModel):
     query: str
     max_credits: int = 18
     semesters: List[str] = ["113-2"]
 
 
+@functools.lru_cache(maxsize=256)
+def _build_filter(semesters: tuple, departments: tuple) -> Optional[models.Filter]:
+    """Build (and memoize) the payload filter for a semester/department combination"""
+    conditions = []
+    if semesters:
+        conditions.append(models.FieldCondition(
+            key="semester",
+            match=models.MatchAny(any=list(semesters))
+        ))
+    if departments:
+        conditions.append(models.FieldCondition(
+            key="host_department",
+            match=models.MatchAny(any=list(departments))
+        ))
+    return models.Filter(must=conditions) if conditions else None
+
+
 class CourseSearchAPI:
-    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333):
+    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333, qdrant_grpc_port: int = 6334):
         """Initialize API with Qdrant client and embedding model"""
         self.client = None
         self.model = None
         self.qdrant_host = qdrant_host
         self.qdrant_port = qdrant_port
-        self.collection_names = collection_names
+        self.qdrant_grpc_port = qdrant_grpc_port
+        self.collection_name = collection_name
+        self.vector_names = vector_names
         self.weights = weights
+        # Course payloads are read-only during a semester, so keep recently used ones in memory
+        self.course_cache = OrderedDict()
+        self.course_cache_size = 8192
+        # Candidate count up to which schedules are solved exactly instead of greedily
+        self.exact_schedule_limit = 64
+        # Search nodes the exact solver may visit before it settles for the best
+        # schedule found so far, which is never worse than the greedy one
+        self.exact_schedule_nodes = 5000
+        # Search the binary-quantized index, then rescore the oversampled candidates
+        # with the original vectors to keep recall
+        self.quantization_params = models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+        # Search hits never need the raw crawler JSON; it is only served by /course/{code}
+        self.search_payload = models.PayloadSelectorExclude(exclude=["original_json_string"])
     
     def _lazy_init(self):
         """Lazy initialization of heavy components"""
         if self.client is None:
             print("Initializing Qdrant client...")
-            self.client = QdrantClient(host=self.qdrant_host, port=self.qdrant_port, check_compatibility=False)
+            self.client = AsyncQdrantClient(
+                host=self.qdrant_host,
+                port=self.qdrant_port,
+                grpc_port=self.qdrant_grpc_port,
+                prefer_grpc=True,
+                timeout=10,
+                # qdrant-client turns off HTTP keep-alive for localhost by default; keep a
+                # pool of warm connections for the REST calls and ping the gRPC channel
+                # so it is not torn down between bursts of requests
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                grpc_options={"grpc.keepalive_time_ms": 30000},
+                check_compatibility=False
+            )
         
         if self.model is None:
-            model_name = "BAAI/bge-m3"
-            print(f"Attempting to load embedding model: {model_name}...")
+            print(f"Attempting to load embedding model: {model_name} ({embedding_backend} backend)...")
             try:
-                self.model = SentenceTransformer(model_name)
+                if uses_quantized_export(model_name):
+                    print(f"Using int8 quantized export: {quantized_model_dir}")
+                self.model = load_query_model(model_name)
                 print(f"Successfully loaded embedding model: {model_name}.")
             except Exception as e:
                 print(f"ERROR: Failed to load SentenceTransformer model '{model_name}'. Error: {e}")
@@ -89,54 +155,83 @@ class CourseSearchAPI:
                 # or let subsequent calls fail if the model is essential.
                 # For now, it will print the error and proceed, potentially failing later.
                 raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
+
+    def warmup(self):
+        """Initialize heavy components and run one dummy encode so the first request is fast"""
+        self._lazy_init()
+        self.model.encode("warmup")
     
+    async def check_payloads(self):
+        """Warn if the indexed payloads predate the ingest-time slot masks"""
+        points, _ = await self.client.scroll(collection_name=self.collection_name, limit=1)
+        if points and "slot_mask" not in points[0].payload:
+            print(f"WARNING: Collection '{self.collection_name}' has no slot_mask payloads; "
+                  "masks will be computed per request. Re-run scripts/embed_upload.py.")
+
     def has_time_conflict(self, course1_slots: List[Dict], course2_slots: List[Dict]) -> bool:
         """Check if two courses have time conflicts based on new time_slots structure."""
-        for slot1 in course1_slots:
-            for slot2 in course2_slots:
-                s1_weekday = slot1.get("weekday")
-                s1_period = slot1.get("period")
-                s2_weekday = slot2.get("weekday")
-                s2_period = slot2.get("period")
-
-                if (s1_weekday is not None and s1_period is not None and
-                    s2_weekday is not None and s2_period is not None and
-                    s1_weekday == s2_weekday and 
-                    s1_period == s2_period):
-                    return True
-        return False
+        return bool(slot_mask(course1_slots) & slot_mask(course2_slots))
     
-    def search_courses(self, query: str, semesters: str = None, departments: List[str] = None, 
-                    top_k: int = 10, ) -> List[Dict[str, Any]]:
-        """Semantic search for courses with optional department filter"""
-        self._lazy_init()
-
-        query_vector = self.model.encode(query).tolist()
+    async def search_courses(self, query: str, semesters: str = None, departments: List[str] = None, 
+                    top_k: int = 10, ef: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Semantic search for courses with optional department filter
+
+        ef is the HNSW candidate list size: larger values raise recall at the cost
+        of latency. It defaults to a value scaled from top_k.
+        """
+        results = await self.search_courses_batch([query], semesters, departments, top_k, ef)
+        return results[0]
+
+    async def search_courses_batch(self, queries: List[str], semesters: str = None, departments: List[str] = None,
+                                   top_k: int = 10, ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """Semantic search for several queries at once
+
+        All queries are encoded in one model call, and every (query, named vector)
+        search goes to Qdrant in a single batch request.
+        """
+        if not queries:
+            return []
+
+        # encode() is CPU-bound; run it off the event loop so other requests keep flowing
+        # Unit-length vectors let the collection use plain dot product instead of cosine
+        query_vectors = await asyncio.to_thread(self.model.encode, queries, convert_to_numpy=True,
+                                                normalize_embeddings=True)
+
+        query_filter = _build_filter(tuple(semesters or ()), tuple(departments or ()))
+        search_params = models.SearchParams(
+            hnsw_ef=ef or max(64, top_k * 4),
+            quantization=self.quantization_params
+        )
 
-        query_filters = []
-        if semesters:
-            query_filters.append(models.FieldCondition(
-                key="semester",
-                match=models.MatchAny(any=semesters)
-            ))
-        if departments:
-            query_filters.append(models.FieldCondition(
-                key="host_department",
-                match=models.MatchAny(any=departments)
-            ))
+        requests = [
+            models.QueryRequest(
+                query=query_vector,
+                using=vector_name,
+                filter=query_filter,
+                limit=top_k*len(self.vector_names),
+                with_payload=self.search_payload,
+                params=search_params,
+            )
+            for query_vector in query_vectors
+            for vector_name in self.vector_names.values()
+        ]
+        responses = await self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        batch_results = [response.points for response in responses]
+
+        attrs = list(self.vector_names)
+        return [
+            self._fuse_results(
+                dict(zip(attrs, batch_results[i*len(attrs):(i+1)*len(attrs)])),
+                top_k
+            )
+            for i in range(len(queries))
+        ]
 
+    def _fuse_results(self, results_by_attr: Dict[str, List[Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Combine per-vector hits into one weighted ranking"""
         course_scrores = {}
         course_data = {}
-        for attr, collection_name in self.collection_names.items():
-            results = self.client.search(
-                collection_name = collection_name,
-                query_vector=query_vector,
-                query_filter=models.Filter(
-                    must=query_filters
-                ) if query_filters else None,
-                limit = top_k*len(self.collection_names),
-                with_payload=True,
-            )
+        for attr, results in results_by_attr.items():
             for point in results:
                 course_id = point.payload['id']
                 score = float(point.score) * self.weights[attr]
@@ -154,14 +249,29 @@ class CourseSearchAPI:
         
         return final_results
 
+    def _cache_get(self, course_code: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached course payload and mark it as recently used"""
+        course = self.course_cache.get(course_code)
+        if course is not None:
+            self.course_cache.move_to_end(course_code)
+        return course
+
+    def _cache_put(self, course_code: str, course: Dict[str, Any]):
+        """Cache a course payload, evicting the least recently used one when full"""
+        self.course_cache[course_code] = course
+        self.course_cache.move_to_end(course_code)
+        if len(self.course_cache) > self.course_cache_size:
+            self.course_cache.popitem(last=False)
 
-    def get_course_by_code(self, course_code: str) -> Optional[Dict[str, Any]]:
+    async def get_course_by_code(self, course_code: str) -> Optional[Dict[str, Any]]:
         """Get specific course by code"""
-        self._lazy_init()
-        
+        course = self._cache_get(course_code)
+        if course is not None:
+            return course
+
         try:
-            search_result = self.client.scroll(
-                collection_name=self.collection_names['name'],
+            search_result = await self.client.scroll(
+                collection_name=self.collection_name,
                 scroll_filter=models.Filter(
                     must=[models.FieldCondition(
                         key="code",
@@ -173,52 +283,100 @@ class CourseSearchAPI:
             
             if search_result[0]:
                 course = search_result[0][0].payload
+                self._cache_put(course_code, course)
                 return course
         except Exception as e:
             print(f"Error retrieving course {course_code}: {e}")
         
         return None
+
+    async def get_courses_by_codes(self, course_codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several courses with a single filtered scroll, keyed by course code"""
+        found = {}
+        for course_code in course_codes:
+            course = self._cache_get(course_code)
+            if course is not None:
+                found[course_code] = course
+        codes = [code for code in dict.fromkeys(course_codes) if code not in found]
+        if not codes:
+            return found
+
+        try:
+            offset = None
+            # A code can exist in several semesters, so keep paging until every code is seen
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=models.Filter(
+                        must=[models.FieldCondition(
+                            key="code",
+                            match=models.MatchAny(any=codes)
+                        )]
+                    ),
+                    limit=len(codes),
+                    offset=offset
+                )
+                for point in points:
+                    course_code = point.payload["code"]
+                    if course_code not in found:
+                        found[course_code] = point.payload
+                        self._cache_put(course_code, point.payload)
+                if offset is None or all(code in found for code in codes):
+                    break
+        except Exception as e:
+            print(f"Error retrieving courses {codes}: {e}")
+
+        return found
     
-    def generate_schedule(self, course_codes: List[str], max_credits: int = 18) -> Dict[str, Any]:
+    async def generate_schedule(self, course_codes: List[str], max_credits: int = 18) -> Dict[str, Any]:
         """Generate conflict-free schedule from course codes"""
-        courses = []
-        for course_code in course_codes:
-            course = self.get_course_by_code(course_code)
-            if course:
-                courses.append(course)
-        
+        found = await self.get_courses_by_codes(course_codes)
+        courses = [found[course_code] for course_code in course_codes if course_code in found]
+        # The solver is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self._schedule_from_courses, courses, max_credits)
+
+    def _schedule_from_courses(self, courses: List[Dict[str, Any]], max_credits: int = 18) -> Dict[str, Any]:
+        """Generate conflict-free schedule from already fetched course payloads"""
         if not courses:
             return {"schedule": [], "total_credits": 0, "conflicts": [], "message": "No valid courses found"}
         
-        # Greedy algorithm for schedule optimization
-        selected_courses = []
-        total_credits = 0
+        # Value a course by its search score when it has one, otherwise by its credits
+        courses = sorted(
+            courses,
+            key=lambda x: (x.get("score", x.get("credits", 0)), x.get("credits", 0)),
+            reverse=True
+        )
+        masks = [course_slot_mask(course) for course in courses]
+        credits = [course.get("credits", 0) for course in courses]
+        values = [course.get("score", course.get("credits", 0)) for course in courses]
+
+        if len(courses) <= self.exact_schedule_limit:
+            picked = self._best_subset(masks, credits, values, max_credits, self.exact_schedule_nodes)
+        else:
+            # Too many candidates for an exact search, fall back to greedy selection
+            picked = []
+        # Add every remaining course that still fits, in candidate order. This is the
+        # whole selection for large candidate sets, and brings back the zero-value
+        # courses (e.g. 0-credit seminars) the exact search leaves out
+        picked = self._greedy_fill(masks, credits, max_credits, picked)
+
+        selected_courses = [courses[i] for i in picked]
+        total_credits = sum(credits[i] for i in picked)
+        occupied_mask = 0
+        for i in picked:
+            occupied_mask |= masks[i]
+
+        # Explain why each remaining course was left out
         conflicts = []
-        
-        # Sort by credits (optional: could sort by other criteria)
-        courses.sort(key=lambda x: x.get("credits", 0), reverse=True)
-        
-        for course in courses:
-            course_credits = course.get("credits", 0)
-            course_time_slots = course.get("time_slots", [])
-            
-            # Check credit limit
-            if total_credits + course_credits > max_credits:
-                conflicts.append(f"Credit limit exceeded: {course['name']} ({course_credits} credits)")
+        picked_set = set(picked)
+        for i, course in enumerate(courses):
+            if i in picked_set:
                 continue
-            
-            # Check time conflicts
-            has_conflict = False
-            for selected_course in selected_courses:
-                selected_time_slots = selected_course.get("time_slots", [])
-                if self.has_time_conflict(course_time_slots, selected_time_slots):
-                    conflicts.append(f"Time conflict: {course['name']} conflicts with {selected_course['name']}")
-                    has_conflict = True
-                    break
-            
-            if not has_conflict:
-                selected_courses.append(course)
-                total_credits += course_credits
+            if masks[i] & occupied_mask:
+                culprit = next(courses[j] for j in picked if masks[i] & masks[j])
+                conflicts.append(f"Time conflict: {course['name']} conflicts with {culprit['name']}")
+            else:
+                conflicts.append(f"Credit limit exceeded: {course['name']} ({credits[i]} credits)")
         
         return {
             "schedule": selected_courses,
@@ -226,20 +384,93 @@ class CourseSearchAPI:
             "conflicts": conflicts,
             "message": f"Successfully scheduled {len(selected_courses)} courses"
         }
+
+    @staticmethod
+    def _greedy_fill(masks: List[int], credits: List[int], max_credits: int, picked: List[int]) -> List[int]:
+        """Extend picked with every course, in index order, that fits its credits and slots"""
+        occupied_mask = 0
+        total_credits = 0
+        for i in picked:
+            occupied_mask |= masks[i]
+            total_credits += credits[i]
+        picked_set = set(picked)
+        extended = list(picked)
+        for i in range(len(masks)):
+            if i not in picked_set and total_credits + credits[i] <= max_credits and not masks[i] & occupied_mask:
+                extended.append(i)
+                occupied_mask |= masks[i]
+                total_credits += credits[i]
+        return sorted(extended)
+
+    @classmethod
+    def _best_subset(cls, masks: List[int], credits: List[int], values: List[float], max_credits: int,
+                     node_budget: int) -> List[int]:
+        """0-1 knapsack over conflict-free course subsets (branch and bound)
+
+        Returns the indices of the highest-value subset whose credits fit in
+        max_credits and whose slot masks do not overlap. The search starts from the
+        greedy schedule and stops after node_budget nodes, so hard instances return
+        the best schedule found by then instead of taking exponential time.
+        """
+        # Courses that add no value can only cost credits, so leave them out. Visit the
+        # rest by value per credit so the fractional bound below is tight
+        order = sorted(
+            (i for i in range(len(masks)) if values[i] > 0),
+            key=lambda i: values[i] / credits[i] if credits[i] > 0 else float("inf"),
+            reverse=True
+        )
+        n = len(order)
+
+        def bound(pos: int, occupied_mask: int, capacity: int) -> float:
+            """Upper bound on the value still reachable: fractional knapsack over compatible courses"""
+            total = 0.0
+            for i in order[pos:]:
+                if masks[i] & occupied_mask:
+                    continue
+                if credits[i] <= capacity:
+                    capacity -= credits[i]
+                    total += values[i]
+                else:
+                    return total + values[i] * capacity / credits[i]
+            return total
+
+        best_subset = [i for i in cls._greedy_fill(masks, credits, max_credits, []) if values[i] > 0]
+        best_value = sum(values[i] for i in best_subset)
+        chosen = []
+        nodes = 0
+
+        def search(pos: int, occupied_mask: int, total_credits: int, total_value: float):
+            nonlocal best_value, best_subset, nodes
+            nodes += 1
+            if nodes > node_budget:
+                return
+            if total_value > best_value:
+                best_value = total_value
+                best_subset = chosen[:]
+            if pos == n or total_value + bound(pos, occupied_mask, max_credits - total_credits) <= best_value:
+                return
+            i = order[pos]
+            if total_credits + credits[i] <= max_credits and not masks[i] & occupied_mask:
+                chosen.append(i)
+                search(pos + 1, occupied_mask | masks[i], total_credits + credits[i], total_value + values[i])
+                chosen.pop()
+            search(pos + 1, occupied_mask, total_credits, total_value)
+
+        search(0, 0, 0, 0.0)
+        return sorted(best_subset)
     
-    def recommend_courses(self, query: str, max_credits: int = 18, 
+    async def recommend_courses(self, query: str, max_credits: int = 18, 
                          semesters: List[str] = ["113-2"]) -> Dict[str, Any]:
         """AI-powered course recommendations"""
         # Get initial recommendations via semantic search
-        recommended_courses = self.search_courses(
+        recommended_courses = await self.search_courses(
             query=query,
             semesters=semesters,
             top_k=20  # Get more candidates for filtering
         )
         
-        # Generate optimized schedule from recommendations
-        course_codes = [course["code"] for course in recommended_courses]
-        schedule_result = self.generate_schedule(course_codes, max_credits)
+        # Generate optimized schedule from recommendations; search already returned full payloads
+        schedule_result = await asyncio.to_thread(self._schedule_from_courses, recommended_courses, max_credits)
         
         return {
             "query": query,
@@ -253,7 +484,24 @@ class CourseSearchAPI:
 
 # Initialize API
 api = CourseSearchAPI()
-app = FastAPI(title="Course Search API", description="Semantic course search and scheduling", version="1.0.0")
+# Responses are plain JSON built from Qdrant payloads, so heavy endpoints return
+# ORJSONResponse directly and skip FastAPI's jsonable_encoder pass
+app = FastAPI(
+    title="Course Search API",
+    description="Semantic course search and scheduling",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
+
+
+@app.on_event("startup")
+async def startup():
+    """Load the embedding model and Qdrant client before serving requests"""
+    await asyncio.to_thread(api.warmup)
+    try:
+        await api.check_payloads()
+    except Exception as e:
+        print(f"WARNING: Could not inspect collection payloads: {e}")
 
 
 @app.get("/")
@@ -266,27 +514,50 @@ async def search_courses(
     q: str = Query(..., description="Search query"),
     semesters: Optional[List[str]] = Query(None, description="Filter by semester"),
     departments: Optional[List[str]] = Query(None, description="Filter by department"),
-    top_k: int = Query(10, description="Number of results to return")
+    top_k: int = Query(10, description="Number of results to return"),
+    ef: Optional[int] = Query(None, ge=1, description="HNSW search breadth; higher improves recall but is slower")
 ):
     """Semantic search for courses"""
     try:
-        results = api.search_courses(
+        results = await api.search_courses(
             query=q,
             semesters=semesters,
             departments=departments,
-            top_k=top_k
+            top_k=top_k,
+            ef=ef
         )
-        return {"query": q, "results": results, "count": len(results)}
+        return ORJSONResponse({"query": q, "results": results, "count": len(results)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@app.post("/search_batch")
+async def search_courses_batch(request: BatchSearchRequest):
+    """Semantic search for several queries in one request"""
+    try:
+        batch_results = await api.search_courses_batch(
+            queries=request.queries,
+            semesters=request.semesters,
+            departments=request.departments,
+            top_k=request.top_k,
+            ef=request.ef
+        )
+        return ORJSONResponse({
+            "results": [
+                {"query": query, "results": results, "count": len(results)}
+                for query, results in zip(request.queries, batch_results)
+            ]
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+
 @app.get("/course/{course_code}")
 async def get_course(course_code: str):
     """Get specific course by code"""
-    course = api.get_course_by_code(course_code)
+    course = await api.get_course_by_code(course_code)
     if course:
-        return course
+        return ORJSONResponse(course)
     else:
         raise HTTPException(status_code=404, detail="Course not found")
 
@@ -295,8 +566,8 @@ async def get_course(course_code: str):
 async def create_schedule(request: ScheduleRequest):
     """Generate conflict-free schedule from course codes"""
     try:
-        result = api.generate_schedule(request.course_codes, request.max_credits)
-        return result
+        result = await api.generate_schedule(request.course_codes, request.max_credits)
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Schedule generation failed: {str(e)}")
 
@@ -305,12 +576,12 @@ async def create_schedule(request: ScheduleRequest):
 async def recommend_courses(request: RecommendationRequest):
     """AI-powered course recommendations"""
     try:
-        result = api.recommend_courses(
+        result = await api.recommend_courses(
             query=request.query,
             max_credits=request.max_credits,
             semesters=request.semesters
         )
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
 
@@ -319,9 +590,8 @@ async def recommend_courses(request: RecommendationRequest):
 async def health_check():
     """Health check endpoint"""
     try:
-        api._lazy_init()
         # Test connection to Qdrant
-        collections = api.client.get_collections()
+        collections = await api.client.get_collections()
         return {
             "status": "healthy",
             "qdrant_connected": True,
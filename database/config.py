@@ -1,5 +1,11 @@
-collection_names = {
-#    attr:  collection_name    
+import os
+
+# All courses live in one collection; each embedded attribute is a named vector
+# on the same point, so the payload is stored only once.
+collection_name = "courses"
+
+vector_names = {
+#    attr:  vector_name
     "name": "name",
     "course_overview": "course_overview",
     "course_objective": "course_objective"
@@ -9,4 +15,24 @@ weights = {
     "name": 0.5,
     "course_overview": 0.3,
     "course_objective": 0.2
-}
\ No newline at end of file
+}
+
+# Embedding model used by the API and tools.
+model_name = "BAAI/bge-m3"
+# sentence-transformers inference backend: "torch", "onnx" or "openvino".
+# "onnx" runs the exported graph through onnxruntime, which is several times
+# faster than PyTorch eager mode on CPU-only hosts.
+embedding_backend = "onnx"
+# Token limit for encoded texts. bge-m3 accepts up to 8192 tokens, but attention
+# cost grows quadratically and course overviews rarely need more than 512.
+max_seq_length = 512
+
+# int8 ONNX export of model_name written by scripts/quantize_model.py. When the
+# directory exists, the API encodes queries with it instead of the fp32 graph;
+# onnxruntime then uses VNNI int8 matmul kernels on CPUs that support them.
+quantized_model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "bge-m3-int8")
+quantized_model_file = "onnx/model_qint8_avx512_vnni.onnx"
+
+# Course text embeddings persisted by scripts/embed_upload.py, keyed by a hash of
+# the text, so re-ingesting an unchanged catalog does not re-run the model.
+embedding_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "embeddings")
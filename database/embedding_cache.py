@@ -0,0 +1,58 @@
+"""
+On-disk embedding cache shared by the ingest script and the query tools
+"""
+
+import hashlib
+import logging
+import os
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Embeddings stored in one .npz file, keyed by a hash of the embedded text"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys = []
+        self.vectors = None
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    self.keys = data["keys"].tolist()
+                    self.vectors = data["vectors"]
+            except Exception as e:
+                logger.warning("Ignoring unreadable embedding cache %s: %s", path, e)
+                self.keys = []
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.dirty = False
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    def encode(self, texts: List[str], encode_fn) -> np.ndarray:
+        """Return one row per text, calling encode_fn only for texts not cached yet"""
+        keys = [self.key(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self.index]
+        if missing:
+            new_vectors = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            for i in missing:
+                self.index[keys[i]] = len(self.keys)
+                self.keys.append(keys[i])
+            self.vectors = new_vectors if self.vectors is None else np.vstack([self.vectors, new_vectors])
+            self.dirty = True
+        return self.vectors[[self.index[key] for key in keys]]
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, keys=np.array(self.keys), vectors=self.vectors)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,49 @@
+"""
+Query embedding model shared by the API and the query tools
+"""
+
+import functools
+import os
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+from database.config import (
+    model_name, embedding_backend, max_seq_length, quantized_model_dir, quantized_model_file
+)
+
+
+def uses_quantized_export(name: str) -> bool:
+    """Whether load_query_model loads name from the int8 ONNX export"""
+    return (not torch.cuda.is_available() and name == model_name and embedding_backend == "onnx"
+            and os.path.isdir(quantized_model_dir))
+
+
+def query_model_tag(name: str) -> str:
+    """Name for the weights and precision load_query_model uses, for cache file names"""
+    if torch.cuda.is_available():
+        return name.replace('/', '--') + "-fp16"
+    if uses_quantized_export(name):
+        return os.path.basename(quantized_model_dir)
+    return name.replace('/', '--')
+
+
+@functools.lru_cache(maxsize=4)
+def load_query_model(name: str) -> SentenceTransformer:
+    """Load an embedding model once per process; later callers reuse it"""
+    if torch.cuda.is_available():
+        # Same as the ingest script: PyTorch on the GPU in fp16
+        model = SentenceTransformer(name, device="cuda")
+        model.half()
+    elif uses_quantized_export(name):
+        # int8 export written by scripts/quantize_model.py; onnxruntime runs it
+        # with VNNI int8 kernels on CPUs that support them
+        model = SentenceTransformer(
+            quantized_model_dir,
+            backend="onnx",
+            model_kwargs={"file_name": quantized_model_file, "provider": "CPUExecutionProvider"}
+        )
+    else:
+        model = SentenceTransformer(name, backend=embedding_backend)
+    model.max_seq_length = max_seq_length
+    return model
@@ -4,80 +4,172 @@ Course Vector Database Upload Script
 Loads course data, creates embeddings, and uploads to Qdrant vector database
 """
 
-import json
-import re
+import orjson
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from typing import List, Dict, Optional
 from sentence_transformers import SentenceTransformer
+from tqdm import tqdm
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Datatype, Distance, VectorParams, Batch, OptimizersConfigDiff, BinaryQuantization, BinaryQuantizationConfig, HnswConfigDiff, PayloadSchemaType
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from database.config import collection_names
+from database.config import (
+    collection_name, vector_names, model_name, embedding_backend, max_seq_length, embedding_cache_dir
+)
+from database.timeslots import slot_mask
+from database.embedding_cache import EmbeddingCache
 
 # --- Logger Setup ---
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "embed_upload.log") # Updated LOG_FILE path
 
-# Create logs directory if it doesn't exist
-if not os.path.exists(LOG_DIR):
-    try:
-        os.makedirs(LOG_DIR)
-    except OSError as e:
-        # This might happen in a race condition if another process creates it.
-        # Or if there are permission issues.
-        print(f"Error creating log directory {LOG_DIR}: {e}")
-        # Fallback to current directory if log dir creation fails
-        LOG_FILE = "embed_upload.log" 
-
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# File handler
-file_handler = logging.FileHandler(LOG_FILE, mode='w') # Overwrite log file each run
-file_handler.setLevel(logging.INFO)
 
-# Console handler (optional, for also printing to console)
-# console_handler = logging.StreamHandler()
-# console_handler.setLevel(logging.INFO)
+def setup_logging():
+    """Attach the file and console handlers. Called from main() rather than at import:
+    upload_collection's and encode_multi_process's worker processes re-import this
+    module, and must not truncate the log the parent is writing."""
+    log_file = LOG_FILE
+    # Create logs directory if it doesn't exist
+    if not os.path.exists(LOG_DIR):
+        try:
+            os.makedirs(LOG_DIR)
+        except OSError as e:
+            # This might happen in a race condition if another process creates it.
+            # Or if there are permission issues.
+            print(f"Error creating log directory {LOG_DIR}: {e}")
+            # Fallback to current directory if log dir creation fails
+            log_file = "embed_upload.log"
+
+    logger.setLevel(logging.INFO)
+
+    # File handler
+    file_handler = logging.FileHandler(log_file, mode='w') # Overwrite log file each run
+    file_handler.setLevel(logging.INFO)
 
-# Formatter
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-# console_handler.setFormatter(formatter)
+    # Console handler, so every message goes through the logger once instead of print() + logger
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.INFO)
 
-logger.addHandler(file_handler)
-# logger.addHandler(console_handler)
+    # Formatter
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
 # --- End Logger Setup ---
 
+# Worker processes used by upload_collection
+UPLOAD_WORKERS = 8
+# Output dimension of known embedding models, so creating collections doesn't
+# require loading the model
+MODEL_DIMENSIONS = {
+    "BAAI/bge-m3": 1024,
+    "paraphrase-multilingual-MiniLM-L12-v2": 384,
+}
+# Threads used to read and parse course JSON files
+LOAD_WORKERS = 16
+# Qdrant's default indexing_threshold (KB), restored after a bulk upload
+DEFAULT_INDEXING_THRESHOLD = 20000
+# Seconds before a Qdrant request is abandoned
+UPLOAD_TIMEOUT = 60
+
 
 class CourseEmbedder:
-    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333):
+    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333, qdrant_grpc_port: int = 6334,
+                 encode_batch_size: int = 64, upload_batch_size: int = 256, use_fp16: bool = True,
+                 num_workers: int = 1):
         """Initialize course embedder with Qdrant client"""
         logger.info("Initializing course embedder...")
-        print("Initializing course embedder...")
-        self.client = QdrantClient(host=qdrant_host, port=qdrant_port, check_compatibility=False)
-        self.model_name = "BAAI/bge-m3"
-        self.embedding_dim = 1024
-        logger.info(f"Attempting to load multilingual semantic model: {self.model_name}...")
-        print(f"Attempting to load multilingual semantic model: {self.model_name}...")
-        try:
-            self.model = SentenceTransformer(self.model_name)
-            test_emb = self.model.encode("test")
-            self.embedding_dim = len(test_emb)
-            logger.info(f"Successfully loaded model {self.model_name}. Embedding dimension: {self.embedding_dim}")
-            print(f"Successfully loaded model {self.model_name}. Embedding dimension: {self.embedding_dim}")
-        except Exception as e:
-            logger.error(f"Failed to load SentenceTransformer model '{self.model_name}'. Error: {e}")
-            print(f"ERROR: Failed to load SentenceTransformer model '{self.model_name}'. Ensure it is installed or accessible. Error: {e}")
-            raise
-        self.collection_names = collection_names
+        # One client, and so one gRPC channel, serves every request of the run;
+        # upload_collection's workers each open their own with the same settings.
+        # gRPC calls otherwise time out after 5s, which the wait=True barrier and
+        # dropping a large collection can exceed.
+        self.client = QdrantClient(host=qdrant_host, port=qdrant_port, grpc_port=qdrant_grpc_port,
+                                   prefer_grpc=True, timeout=UPLOAD_TIMEOUT, check_compatibility=False)
+        self.model_name = model_name
+        # Texts per forward pass; raise it on GPUs with memory to spare
+        self.encode_batch_size = encode_batch_size
+        # Points per upload request; 1024-dim float vectors make each point ~4KB
+        self.upload_batch_size = upload_batch_size
+        # Half precision on CUDA; turn off to get bit-for-bit fp32 vectors
+        self.use_fp16 = use_fp16
+        # Encoding processes (one per GPU on CUDA hosts). On CPU, onnxruntime already
+        # spreads a single process across all cores, so the default is 1.
+        self.num_workers = num_workers
+        # Loaded on first use: recreating collections or a fully cached upload never needs it
+        self._model = None
+        self.embedding_dim = MODEL_DIMENSIONS.get(self.model_name) or self.model.get_sentence_embedding_dimension()
+        self.collection_name = collection_name
+        self.vector_names = vector_names
+        # The model property loads fp16 PyTorch on CUDA (fp32 with use_fp16=False) and
+        # the configured backend on CPU. Each produces slightly different vectors, and
+        # truncation changes them too, so all of it is part of the cache key.
+        if torch.cuda.is_available():
+            precision_tag = "fp16" if use_fp16 else "torch-fp32"
+        else:
+            precision_tag = f"{embedding_backend}-fp32"
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(embedding_cache_dir,
+                         f"{self.model_name.replace('/', '--')}-{precision_tag}-{max_seq_length}.npz")
+        )
         logger.info("Initialization complete.")
-        print("Initialization complete.")
     
+    @property
+    def model(self) -> SentenceTransformer:
+        """The embedding model, loaded on first access"""
+        if self._model is None:
+            logger.info(f"Attempting to load multilingual semantic model: {self.model_name}...")
+            try:
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                if self.device == "cuda":
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+                    if self.use_fp16:
+                        # fp16 halves memory traffic and uses tensor cores; cosine drift is negligible
+                        self._model.half()
+                else:
+                    # On CPU the exported ONNX graph (fused kernels, Rust tokenizer) beats eager PyTorch
+                    self._model = SentenceTransformer(self.model_name, device=self.device, backend=embedding_backend)
+                self._model.max_seq_length = max_seq_length
+                if not getattr(self._model.tokenizer, "is_fast", False):
+                    logger.warning("Tokenizer is not a fast (Rust) tokenizer; install 'tokenizers' for faster encoding")
+                logger.info(f"Successfully loaded model {self.model_name} on {self.device}.")
+            except Exception as e:
+                logger.error(f"Failed to load SentenceTransformer model '{self.model_name}'. Ensure it is installed or accessible. Error: {e}")
+                raise
+        return self._model
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into normalized embeddings, sharding across worker processes if configured"""
+        model = self.model  # loads the model and sets self.device on first use
+        if self.num_workers > 1:
+            if self.device == "cuda":
+                target_devices = [f"cuda:{i}" for i in range(min(self.num_workers, torch.cuda.device_count()))]
+            else:
+                target_devices = ["cpu"] * self.num_workers
+            pool = model.start_multi_process_pool(target_devices=target_devices)
+            try:
+                return model.encode_multi_process(
+                    texts, pool, batch_size=self.encode_batch_size, normalize_embeddings=True
+                )
+            finally:
+                model.stop_multi_process_pool(pool)
+        return model.encode(
+            texts,
+            batch_size=self.encode_batch_size,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+
     def parse_time_slots(self, schedules: List[Dict]) -> List[Dict]:
         """Parse schedule objects into structured time slots, keeping original values."""
         if not schedules:
@@ -96,77 +188,39 @@ class CourseEmbedder:
             classroom_name = classroom_info.get('name', 'N/A')
             
             if weekday is None: # Skip if weekday is not defined
-                logger.debug(f"Skipping schedule_item due to missing weekday: {schedule_item}")
+                logger.debug("Skipping schedule_item due to missing weekday: %s", schedule_item)
                 continue
                 
-            for period in intervals:
-                parsed_slots.append({
+            parsed_slots.extend(
+                {
                     "weekday": weekday,       # Store original integer weekday
                     "period": str(period),    # Store original period string/number
                     "classroom": classroom_name
-                })
+                }
+                for period in intervals
+            )
         return parsed_slots
     
-    def _get_nested_value(self, data: Dict, path: List[str], default: Any = None) -> Any:
-        """Safely get a value from a nested dictionary."""
-        current = data
-        for key in path:
-            if isinstance(current, dict) and key in current:
-                current = current[key]
-            else:
-                return default
-        return current
-
-    def create_embedding_text(self, course: Dict) -> str:
-        """Create text for embedding from new course data structure"""
-        texts = []
-        
-        # Course name (most important)
-        if course.get('name'):
-            texts.append(course['name'])
-        
-        # Course overview and objectives from info sub-dictionary
-        course_overview = self._get_nested_value(course, ['info', '課程概述'])
-        if course_overview:
-            texts.append(str(course_overview))
-        
-        course_objective = self._get_nested_value(course, ['info', '課程目標'])
-        if course_objective:
-            texts.append(str(course_objective))
-        
-        # Teacher name
-        teacher_name = self._get_nested_value(course, ['teacher', 'name'])
-        if teacher_name:
-            texts.append(f"授課教師: {teacher_name}")
-        
-        # Host Department
-        host_department = course.get('hostDepartment')
-        if host_department:
-            texts.append(f"開課單位: {host_department}")
-
-        return " ".join(filter(None, texts))
-    
-    def process_course(self, course: Dict) -> Optional[PointStruct]:
+    def process_course(self, course: Dict) -> Optional[Dict]:
         """Process a single course into vector database format using new structure"""
         
         course_id = course.get('id')
         if not course_id:
             logger.warning(f"Course missing 'id', skipping: {course.get('name', 'Unknown Name')}")
-            print(f"Warning: Course missing 'id', skipping: {course.get('name', 'Unknown Name')}")
             return None
 
-        # Create embedding text
-        # embedding_text = self.create_embedding_text(course)
-        
-        # Generate embedding
-        # embedding = self.model.encode(embedding_text).tolist()
-        
+        # The crawler's schema is fixed, so read nested fields directly; 'or {}'
+        # covers keys that are present but null
+        teacher = course.get('teacher') or {}
+        info = course.get('info') or {}
+        schedules = course.get('schedules') or []
+
         # Parse time slots from schedules array
-        time_slots = self.parse_time_slots(course.get('schedules', []))
+        time_slots = self.parse_time_slots(schedules)
         
         # Store the entire original JSON as a string
         try:
-            original_json_string = json.dumps(course, ensure_ascii=False)
+            original_json_string = orjson.dumps(course).decode()
         except TypeError as e:
             logger.error(f"Could not serialize course to JSON for id {course_id}: {e}")
             original_json_string = "Error serializing original JSON"
@@ -180,203 +234,320 @@ class CourseEmbedder:
             "code": course.get('code', ''),
             "semester": course.get('semester', ''),
             "host_department": course.get('hostDepartment', ''), # Renamed from department
-            "teacher_name": self._get_nested_value(course, ['teacher', 'name'], ''),
-            "teacher_id": self._get_nested_value(course, ['teacher', 'id'], ''),
+            "teacher_name": teacher.get('name', ''),
+            "teacher_id": teacher.get('id', ''),
             "credits": course.get('credits', 0),
             
             "notes": course.get('notes', ''),
             "time_slots": time_slots, # Parsed from schedules
+            "slot_mask": format(slot_mask(time_slots), "x"), # Hex bitmask used by the API's conflict checks
             # Extracting first classroom as a simple representation, can be enhanced
-            "classroom": self._get_nested_value(course, ['schedules', 0, 'classroom', 'name'], 'N/A') if course.get('schedules') else 'N/A',
+            "classroom": (schedules[0].get('classroom') or {}).get('name', 'N/A') if schedules else 'N/A',
             
             "targets": [target.get('department').get('name') if isinstance(target.get('department'), dict) else None for target in course.get('courseTargets', [])], # Extracting department names with type-check
             
-            "course_overview": self._get_nested_value(course, ['info', '課程概述'], ''),
-            "course_objective": self._get_nested_value(course, ['info', '課程目標'], ''),
+            "course_overview": info.get('課程概述', ''),
+            "course_objective": info.get('課程目標', ''),
             
-            # "embedding_text": embedding_text, # For debugging
+            # Embedded texts are not duplicated here: the API fuses per-attribute
+            # vectors, and the source fields above already hold the text
             "original_json_string": original_json_string # Store full original JSON
-            # "full_text" was removed as embedding_text serves a similar purpose for search debugging
         }
         
         return payload
-        # return PointStruct(
-        #     id=course_id, # Use UUID from course data
-        #     vector=embedding,
-        #     payload=payload
-        # )
     
     def create_collections(self):
         """Create or recreate the courses collection"""
         msg = "\nCreating vector database collection..."
         logger.info(msg)
-        print(msg)
-        
-        for attr, collection_name in self.collection_names.items():
-            try:
-                # Delete existing collection if it exists
-                self.client.delete_collection(collection_name=collection_name)
-                msg = f"Deleted existing collection: {collection_name}"
-                logger.info(msg)
-                print(msg)
-            except Exception as e:
-                msg = f"Collection {collection_name} may not exist or could not be deleted: {e}"
-                logger.warning(msg)
-                print(f"Warning: {msg}")
         
-            # Create new collection
-            self.client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
+        try:
+            # Delete existing collection if it exists
+            self.client.delete_collection(collection_name=self.collection_name)
+            msg = f"Deleted existing collection: {self.collection_name}"
+            logger.info(msg)
+        except Exception as e:
+            msg = f"Collection {self.collection_name} may not exist or could not be deleted: {e}"
+            logger.warning(msg)
+    
+        # Create new collection with one named vector per embedded attribute
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config={
+                vector_name: VectorParams(
                     size=self.embedding_dim,  # Use dynamic embedding_dim from loaded model
-                    distance=Distance.COSINE
+                    # Embeddings are normalized on both sides, so dot product equals cosine
+                    distance=Distance.DOT,
+                    # Search runs on the binary-quantized copies kept in RAM (see
+                    # quantization_config); the originals are stored on disk as float16
+                    # (Qdrant >= 1.10) and memory-mapped, read only to rescore candidates
+                    on_disk=True,
+                    datatype=Datatype.FLOAT16
                 )
+                for vector_name in self.vector_names.values()
+            },
+            # Denser graph than the default (ef_construct=100) for better recall at a given search ef
+            hnsw_config=HnswConfigDiff(m=16, ef_construct=200),
+            # 1-bit vectors kept in RAM for fast search; the API rescores with the float16 originals
+            quantization_config=BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            ),
+            # Payloads carry the full course JSON; keep them on disk so RAM holds only
+            # the vectors and the payload indexes
+            on_disk_payload=True,
+            # No HNSW indexing while the collection is bulk loaded; upload_courses
+            # restores the default threshold once every point is in
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
+        )
+        # Keyword indexes let Qdrant apply the API's filters during graph traversal
+        # instead of scanning payloads after the fact
+        for field_name in ("semester", "host_department", "code"):
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
             )
-            msg = f"Created collection: {collection_name} with vector size {self.embedding_dim}"
-            logger.info(msg)
-            print(msg)
+        msg = f"Created collection: {self.collection_name} with vectors {list(self.vector_names.values())} of size {self.embedding_dim}"
+        logger.info(msg)
     
     def upload_courses(self, courses: List[Dict]):
         """Upload course data to vector database"""
         msg_uploading = "\nUploading course data..."
         logger.info(msg_uploading)
-        print(msg_uploading)
         
         num_total_courses = len(courses)
         msg_starting = f"Starting upload of {num_total_courses} courses..."
         logger.info(msg_starting)
-        print(msg_starting)
         
-        processed_count = 0
+        # The payload is the same for every vector; only the embedded text
+        # differs, so build it once per course
+        parsed_courses = []
         skipped_count = 0
+        # The crawler saves each course twice under the same id: in the semester's
+        # course list without page info, and in its own file with it. Points with the
+        # same id overwrite each other, so keep one record per id, preferring the one
+        # with info (otherwise the last one loaded).
+        course_positions = {}
+        ids_with_info = set()
+        duplicate_count = 0
+        for i, course_data in enumerate(tqdm(courses, desc="Building payloads", unit="course")):
+            # %-style arguments are only formatted when debug logging is on
+            logger.debug("Processing course %d/%d: %.50s...", i + 1, num_total_courses, course_data.get('name', 'Unknown Name'))
+            parsed_data = self.process_course(course_data)
+            if not parsed_data:
+                skipped_count += 1
+                continue
+            course_id = parsed_data['id']
+            has_info = bool(course_data.get('info'))
+            position = course_positions.get(course_id)
+            if position is None:
+                course_positions[course_id] = len(parsed_courses)
+                parsed_courses.append(parsed_data)
+            else:
+                duplicate_count += 1
+                if has_info or course_id not in ids_with_info:
+                    parsed_courses[position] = parsed_data
+            if has_info:
+                ids_with_info.add(course_id)
+        processed_count = len(parsed_courses)
+        if duplicate_count > 0:
+            logger.info(f"Merged {duplicate_count} duplicate course records by id")
+
+        if skipped_count > 0:
+            msg_skipped = f"Skipped {skipped_count} courses due to missing 'id' or other processing issues."
+            logger.warning(msg_skipped)
         
-        for attr, collection_name in self.collection_names.items():
-            points = []
-            for i, course_data in enumerate(courses):
-                logger.debug(f"Processing course {i+1}/{num_total_courses}: {self._get_nested_value(course_data, ['name'], 'Unknown Name')[:50]}...")
-                # point = self.process_course(course_data) # Pass the whole course dict
-                # if point:
-                #     points.append(point)
-                #     processed_count += 1
-                # else:
-                #     skipped_count +=1
-
-                parsed_data = self.process_course(course_data)
-                if parsed_data:
-                    processed_count += 1
-                else:
-                    skipped_count += 1
-                    continue
-                
-                if parsed_data[attr] is None or parsed_data[attr] == '':
-                    logger.warning(f"Skipping course {parsed_data['id']} due to missing attribute '{attr}'")
-                    print(f"Warning: Skipping course {parsed_data['id']} due to missing attribute '{attr}'")
-                    skipped_count += 1
+        # Text of each course per named vector. Courses without text for an
+        # attribute are left out of its mapping.
+        vector_texts = {}
+        for attr, vector_name in self.vector_names.items():
+            texts = {}
+            for i, parsed_data in enumerate(parsed_courses):
+                # Whitespace-only text would still cost a forward pass for a meaningless vector
+                if not parsed_data[attr] or not str(parsed_data[attr]).strip():
+                    logger.debug("Course %s has no '%s' text; leaving out its '%s' vector", parsed_data['id'], attr, vector_name)
                     continue
-                embedding = self.model.encode(parsed_data[attr]).tolist()
-                point = PointStruct(
-                    id = parsed_data['id'],
-                    vector = embedding,
-                    payload = parsed_data
+                texts[i] = parsed_data[attr]
+            if len(texts) < len(parsed_courses):
+                logger.warning(f"{len(parsed_courses) - len(texts)} courses have no '{attr}' text; "
+                               f"their '{vector_name}' vector is left out")
+            if texts:
+                vector_texts[vector_name] = texts
+
+        # Encode the texts of all attributes in one call so the model runs full
+        # batches instead of one forward pass per course. encode() sorts the whole
+        # list by length before batching, so each batch pads only to texts of
+        # similar length; don't pre-chunk the list or that is lost.
+        # Sections of the same course repeat names and syllabus text (and a short
+        # course's name can equal its objective), so each distinct text is encoded
+        # once and its row reused.
+        unique_texts = list(dict.fromkeys(text for texts in vector_texts.values() for text in texts.values()))
+        text_index = {text: i for i, text in enumerate(unique_texts)}
+        # Texts embedded by an earlier run are read back from the disk cache
+        cached_before = len(self.embedding_cache.keys)
+        unique_embeddings = self.embedding_cache.encode(
+            unique_texts,
+            self.encode_texts
+        ) if unique_texts else None
+        newly_encoded = len(self.embedding_cache.keys) - cached_before
+        logger.info(f"Embedding cache: {len(unique_texts) - newly_encoded} hits, {newly_encoded} encoded")
+        logger.info(f"Encoded {len(unique_texts)} unique texts for "
+                    f"{sum(len(texts) for texts in vector_texts.values())} vectors")
+
+        # Per named vector: the shared embedding matrix and each course's row in it
+        vector_rows = {
+            vector_name: (unique_embeddings, {i: text_index[text] for i, text in texts.items()})
+            for vector_name, texts in vector_texts.items()
+        }
+
+        self.embedding_cache.save()
+
+        # Group courses by the set of vectors they carry. Each group can then be
+        # handed to upload_collection as named numpy matrices, which it slices per
+        # batch inside the workers instead of pickling per-point Python float lists.
+        groups = {}
+        for i in range(len(parsed_courses)):
+            names = tuple(name for name, (_, rows) in vector_rows.items() if i in rows)
+            if names:
+                groups.setdefault(names, []).append(i)
+        if not groups:
+            msg_no_points = "No valid course data points to upload after processing."
+            logger.warning(msg_no_points)
+            return
+
+        # create_collections leaves indexing off, so segments are indexed once at the
+        # end instead of being rebuilt as batches arrive
+        actual_uploaded_count = 0
+        try:
+            # upload_collection splits the points into batches and pushes them from
+            # several worker processes concurrently; wait=False lets each batch return
+            # once it is in the WAL, so sending overlaps with the server applying them
+            for names, indices in groups.items():
+                self.client.upload_collection(
+                    collection_name=self.collection_name,
+                    vectors={
+                        name: vector_rows[name][0][[vector_rows[name][1][i] for i in indices]]
+                        for name in names
+                    },
+                    payload=[parsed_courses[i] for i in indices],
+                    ids=[parsed_courses[i]['id'] for i in indices],
+                    batch_size=self.upload_batch_size,
+                    parallel=UPLOAD_WORKERS,
+                    wait=False
                 )
-                points.append(point)   
-        
-            if skipped_count > 0:
-                msg_skipped = f"Skipped {skipped_count} courses due to missing 'id' or other processing issues."
-                logger.warning(msg_skipped)
-                print(f"Warning: {msg_skipped}")
-
-            if not points:
-                msg_no_points = "No valid course data points to upload after processing."
-                logger.warning(msg_no_points)
-                print(f"Warning: {msg_no_points}")
-                continue
-                # return
-
-            # Upload in batches
-            batch_size = 100
-            actual_uploaded_count = 0
-            for i in range(0, len(points), batch_size):
-                batch = points[i:i+batch_size]
-                try:
-                    self.client.upsert(
-                        collection_name=collection_name,
-                        points=batch
-                    )
-                    actual_uploaded_count += len(batch)
-                    logger.info(f"Uploaded batch {i//batch_size + 1}/{(len(points) + batch_size - 1)//batch_size}, {len(batch)} points.")
-                except Exception as e:
-                    logger.error(f"Error uploading batch {i//batch_size + 1}: {e}")
-                    print(f"ERROR: Error uploading batch {i//batch_size + 1}: {e}")
-
-            msg_success = f"Successfully processed {processed_count} courses. Uploaded {actual_uploaded_count} courses to vector database."
-            logger.info(msg_success)
-            print(msg_success)
+                actual_uploaded_count += len(indices)
+            # Updates are applied in WAL order, so rewriting the last point with
+            # wait=True is a barrier for every batch sent above
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=Batch(
+                    ids=[parsed_courses[indices[-1]]['id']],
+                    vectors={name: [vector_rows[name][0][vector_rows[name][1][indices[-1]]].tolist()] for name in names},
+                    payloads=[parsed_courses[indices[-1]]]
+                ),
+                wait=True
+            )
+        except Exception as e:
+            logger.error(f"Error uploading to {self.collection_name} after sending "
+                         f"{actual_uploaded_count} of {processed_count} courses: {e}")
+            raise
+        finally:
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                optimizer_config=OptimizersConfigDiff(indexing_threshold=DEFAULT_INDEXING_THRESHOLD)
+            )
+
+        msg_success = f"Successfully processed {processed_count} courses. Uploaded {actual_uploaded_count} courses to vector database."
+        logger.info(msg_success)
+
+
+def _iter_json_files(directory: str):
+    """Yield paths of all .json files under directory, recursing with os.scandir
+
+    Top-down like os.walk: a directory's files come before its subdirectories, each
+    in name order, so data/course_{semester}.json is loaded before the per-course
+    files in data/{semester}/ regardless of the filesystem's directory order.
+    """
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    subdirectories = []
+    for entry in entries:
+        if entry.is_dir():
+            subdirectories.append(entry.path)
+        elif entry.is_file() and entry.name.endswith(".json"):
+            yield entry.path
+    for subdirectory in subdirectories:
+        yield from _iter_json_files(subdirectory)
+
+
+def _load_json_file(file_path: str) -> List[Dict]:
+    """Parse one course JSON file into a list of courses ([] on error)"""
+    filename = os.path.basename(file_path)
+    logger.debug(f"Processing file: {file_path}...")
+    try:
+        with open(file_path, 'rb') as f:
+            courses_in_file = orjson.loads(f.read())
+        if isinstance(courses_in_file, list):
+            return courses_in_file
+        elif isinstance(courses_in_file, dict):
+            return [courses_in_file]
+        else:
+            warn_msg = f"{filename} does not contain a list or a single dictionary of courses. Skipping."
+            logger.warning(warn_msg)
+    except orjson.JSONDecodeError as e:
+        err_msg_json = f"Error parsing JSON file {filename}: {e}"
+        logger.error(err_msg_json)
+    except Exception as e: # This except handles errors during file processing (not JSON parsing)
+        err_msg_proc = f"An unexpected error occurred while processing {filename}: {e}"
+        logger.error(err_msg_proc)
+    return []
 
 
 def load_course_data(data_dir: str = "data/") -> List[Dict]:
     """Load course data from all JSON files in the specified directory and its subdirectories (recursively)"""
     msg_loading = f"Loading course data recursively from directory: {data_dir}"
     logger.info(msg_loading)
-    print(msg_loading)
     all_courses = []
     
     if not os.path.isdir(data_dir):
         err_msg = f"Data directory not found at {data_dir}"
         logger.error(err_msg)
-        print(f"ERROR: {err_msg}")
         return []
             
-    for root, _, files in os.walk(data_dir):
-        for filename in files:
-            if filename.endswith(".json"):
-                file_path = os.path.join(root, filename)
-                logger.info(f"Processing file: {file_path}...")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        courses_in_file = json.load(f)
-                        if isinstance(courses_in_file, list):
-                            all_courses.extend(courses_in_file)
-                        elif isinstance(courses_in_file, dict):
-                            all_courses.append(courses_in_file)
-                        else:
-                            warn_msg = f"{filename} does not contain a list or a single dictionary of courses. Skipping."
-                            logger.warning(warn_msg)
-                            print(f"Warning: {warn_msg}")
-                except json.JSONDecodeError as e:
-                    err_msg_json = f"Error parsing JSON file {filename}: {e}"
-                    logger.error(err_msg_json)
-                    print(f"ERROR: {err_msg_json}")
-                except Exception as e: # This except handles errors during file processing (not JSON parsing)
-                    err_msg_proc = f"An unexpected error occurred while processing {filename}: {e}"
-                    logger.error(err_msg_proc)
-                    print(f"ERROR: {err_msg_proc}")
+    file_paths = list(_iter_json_files(data_dir))
+    if len(file_paths) < 4:
+        for file_path in file_paths:
+            all_courses.extend(_load_json_file(file_path))
+    else:
+        # Threads overlap the file reads, which release the GIL. Parsing holds it,
+        # but orjson parses a crawled course file in microseconds, so a process
+        # pool would spend more time pickling the dicts back than it saves.
+        # map() keeps the results in file order.
+        with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+            for courses_in_file in executor.map(_load_json_file, file_paths):
+                all_courses.extend(courses_in_file)
     
     if not all_courses:
         warn_msg_none = f"No courses found in JSON files in {data_dir} or its subdirectories"
         logger.warning(warn_msg_none)
-        print(f"Warning: {warn_msg_none}")
     else:
         success_msg_load = f"Successfully loaded a total of {len(all_courses)} courses from {data_dir} and its subdirectories"
         logger.info(success_msg_load)
-        print(success_msg_load)
     return all_courses
 
 
 def main():
     """Main execution function"""
+    setup_logging()
     start_msg = "Course Vector Database Upload Script Started"
     separator = "=" * 40
     logger.info(start_msg)
-    print(start_msg)
     logger.info(separator)
-    print(separator)
     
     courses = load_course_data() 
     if not courses:
         exit_msg = "No course data to process. Exiting."
         logger.warning(exit_msg)
-        print(exit_msg)
         return
     
     embedder = CourseEmbedder()
@@ -388,9 +559,7 @@ def main():
     complete_msg = "\nUpload complete!"
     ready_msg = "Vector database is ready for use."
     logger.info(complete_msg)
-    print(complete_msg)
     logger.info(ready_msg)
-    print(ready_msg)
 
 
 if __name__ == "__main__":
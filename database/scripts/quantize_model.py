@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Embedding Model Quantization Script
+Exports the embedding model to ONNX and writes an int8 (AVX-512 VNNI) copy for CPU inference
+"""
+
+import sys
+import os
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from database.config import model_name, quantized_model_dir, quantized_model_file
+
+# Quantization presets supported by optimum; pick the one matching the serving CPU
+QUANTIZATION_CONFIGS = ("avx512_vnni", "avx512", "avx2", "arm64")
+
+
+def main():
+    """Main execution function"""
+    config = sys.argv[1] if len(sys.argv) > 1 else "avx512_vnni"
+    if config not in QUANTIZATION_CONFIGS:
+        print(f"Unknown quantization config: {config}")
+        print(f"Choose one of: {', '.join(QUANTIZATION_CONFIGS)}")
+        sys.exit(1)
+
+    print(f"Exporting {model_name} to ONNX...")
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save(quantized_model_dir)
+
+    print(f"Quantizing with the {config} preset...")
+    export_dynamic_quantized_onnx_model(model, config, quantized_model_dir)
+
+    output_file = f"onnx/model_qint8_{config}.onnx"
+    print(f"Saved quantized model to {os.path.join(quantized_model_dir, output_file)}")
+    if output_file != quantized_model_file:
+        print(f"Set quantized_model_file = \"{output_file}\" in config.py to use it")
+
+
+if __name__ == "__main__":
+    main()
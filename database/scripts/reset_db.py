@@ -5,6 +5,7 @@ Clears all vector data from Qdrant database
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams
 
@@ -33,9 +34,12 @@ class DatabaseResetter:
             collections = self.client.get_collections()
             if collections.collections:
                 print("Existing collections:")
-                for collection in collections.collections:
-                    count = self.client.count(collection_name=collection.name)
-                    print(f"  - {collection.name}: {count.count} points")
+                names = [collection.name for collection in collections.collections]
+                # One count request per collection; send them concurrently
+                with ThreadPoolExecutor(max_workers=min(8, len(names))) as executor:
+                    counts = executor.map(lambda name: self.client.count(collection_name=name).count, names)
+                    for name, count in zip(names, counts):
+                        print(f"  - {name}: {count} points")
             else:
                 print("No collections found")
         except Exception as e:
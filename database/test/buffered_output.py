@@ -0,0 +1,40 @@
+"""
+Per-test output buffering shared by the concurrent test suites
+"""
+
+import asyncio
+import contextvars
+from typing import Optional
+
+# Lines logged by the test running in the current task; None outside a suite run
+_test_output = contextvars.ContextVar("test_output", default=None)
+
+
+def log(message: str = ""):
+    """Print a line, or buffer it while the test runs under run_buffered"""
+    lines = _test_output.get()
+    if lines is None:
+        print(message)
+    else:
+        lines.append(message)
+
+
+async def run_buffered(test_name: str, test_func, timeout: Optional[float] = None,
+                       timeout_reason: str = "deadline exceeded"):
+    """Run one test and return its result with the lines it logged
+
+    Call it in its own task (asyncio.create_task or gather): setting the buffer
+    then only affects that test's context, so concurrent tests' output stays
+    apart and can be printed in order afterwards.
+    """
+    lines = []
+    _test_output.set(lines)
+    try:
+        result = await asyncio.wait_for(test_func(), timeout=timeout)
+    except asyncio.TimeoutError:
+        log(f"SKIP - {test_name}: {timeout_reason}")
+        result = False
+    except Exception as e:
+        log(f"FAIL - {test_name} crashed: {e}")
+        result = False
+    return result, lines
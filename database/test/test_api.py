@@ -4,34 +4,171 @@ API Test Suite
 Tests FastAPI endpoints for the course vector database system
 """
 
-import requests
-import json
+import asyncio
+import functools
+import httpx
+import orjson
+import os
+import sys
 import time
-from typing import Dict, List
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Optional, Tuple, Union
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from database.test.buffered_output import log, run_buffered
+
+
+# Most GET responses APITester keeps for reuse
+GET_CACHE_SIZE = 256
+# POST bodies are serialized with orjson, so the content type is set by hand
+JSON_HEADERS = {"Content-Type": "application/json"}
+# The recommendation request never changes, so it is serialized once
+RECOMMEND_REQUEST_BODY = orjson.dumps({
+    "query": "artificial intelligence",
+    "max_credits": 15,
+    "semesters": ["113-2"]
+})
+
+# Expected type of each time_slots field. Scheduled courses are only checked for
+# weekday and period.
+TIME_SLOT_FIELDS = (("weekday", int), ("period", str), ("classroom", str))
+SCHEDULED_SLOT_FIELDS = TIME_SLOT_FIELDS[:2]
+
+
+def valid_time_slot(slot: Dict, fields=TIME_SLOT_FIELDS) -> bool:
+    """Check that a time slot has each field with its expected type"""
+    return all(isinstance(slot.get(name), expected) for name, expected in fields)
 
 
 class APITester:
-    def __init__(self, api_base_url: str = "http://localhost:8000"):
-        """Initialize API tester"""
+    def __init__(self, api_base_url: str = "http://localhost:8000", cache: bool = True):
+        """Initialize API tester; cache=False sends every GET to the server"""
         self.base_url = api_base_url
+        self._client = None
+        # Every request shares one timeout, and the whole suite one time budget,
+        # so a stalled service fails the run in bounded time
+        self.request_timeout = float(os.getenv("API_TEST_TIMEOUT", "20"))
+        self.suite_timeout = float(os.getenv("API_SUITE_DEADLINE", "30"))
+        # The API only starts listening once the embedding model has loaded, so a
+        # cold start gets as long as a request would
+        self.ready_timeout = float(os.getenv("API_READY_TIMEOUT", str(self.request_timeout)))
+        self.suite_deadline = None
+        # GET requests by path and parameters, least recently used first. Tests that
+        # make the same request share it, even while it is still in flight, and
+        # repeated runs of the suite reuse it once it has succeeded. Failed requests
+        # and non-200 responses are evicted, so they are retried. POSTs are never cached.
+        self.cache = cache
+        self._get_cache: "OrderedDict[tuple, asyncio.Task]" = OrderedDict()
         print(f"Testing API at: {self.base_url}")
     
-    def test_health_check(self) -> bool:
+    async def __aenter__(self):
+        # One client keeps connections to the API alive and lets concurrent
+        # requests share its pool
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.request_timeout,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+    
+    @staticmethod
+    def _cache_key(path: str, params: Optional[Dict] = None) -> tuple:
+        """Hashable key for a GET request"""
+        return (path, tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in (params or {}).items()
+        )))
+    
+    async def _get(self, path: str, params: Optional[Dict] = None) -> httpx.Response:
+        """GET path, reusing the response of an identical earlier request"""
+        if not self.cache:
+            return await self._client.get(path, params=params)
+        key = self._cache_key(path, params)
+        task = self._get_cache.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._client.get(path, params=params))
+            task.add_done_callback(functools.partial(self._evict_failed, key))
+            self._get_cache[key] = task
+            if len(self._get_cache) > GET_CACHE_SIZE:
+                self._get_cache.popitem(last=False)
+        else:
+            self._get_cache.move_to_end(key)
+        # Shielded so a test cut off by the suite deadline doesn't cancel a
+        # request other tests are also waiting on
+        return await asyncio.shield(task)
+    
+    def _evict_failed(self, key: tuple, task: asyncio.Future):
+        """Drop a finished GET from the cache unless it returned 200"""
+        if task.cancelled() or task.exception() is not None or task.result().status_code != 200:
+            if self._get_cache.get(key) is task:
+                del self._get_cache[key]
+    
+    async def _get_many(self, requests: List[Tuple[str, Dict]]) -> List[Union[httpx.Response, Exception]]:
+        """GET several (path, params) requests concurrently; results are in request
+        order, with the exception in place of any request that failed"""
+        return await asyncio.gather(
+            *(self._get(path, params) for path, params in requests),
+            return_exceptions=True
+        )
+    
+    async def _search(self, params: Dict) -> httpx.Response:
+        """GET /search, reusing the response of an identical earlier query"""
+        return await self._get("/search", params)
+    
+    async def wait_ready(self, deadline_s: Optional[float] = None) -> bool:
+        """Poll /health until the API answers 200 or deadline_s seconds
+        (default API_READY_TIMEOUT) pass"""
+        if deadline_s is None:
+            deadline_s = self.ready_timeout
+        start = time.monotonic()
+        while time.monotonic() - start < deadline_s:
+            try:
+                response = await self._client.get("/health", timeout=0.5)
+                if response.status_code == 200:
+                    # test_health_check can reuse this response instead of asking again
+                    if self.cache:
+                        ready = asyncio.get_running_loop().create_future()
+                        ready.set_result(response)
+                        self._get_cache[self._cache_key("/health")] = ready
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.05)
+        return False
+    
+    @staticmethod
+    def _json(response: httpx.Response):
+        """Decode a JSON response body with orjson"""
+        return orjson.loads(response.content)
+    
+    async def _run_buffered(self, test_name: str, test_func):
+        """Run one test within what is left of the suite deadline"""
+        return await run_buffered(
+            test_name, test_func,
+            timeout=max(self.suite_deadline - time.monotonic(), 0),
+            timeout_reason=f"suite deadline of {self.suite_timeout:g}s exceeded"
+        )
+    
+    async def test_health_check(self) -> bool:
         """Test health check endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=20)
+            response = await self._get("/health")
             if response.status_code == 200:
-                data = response.json()
-                print(f"PASS - Health Check: {data.get('status', 'OK')}")
+                data = self._json(response)
+                log(f"PASS - Health Check: {data.get('status', 'OK')}")
                 return True
             else:
-                print(f"FAIL - Health Check: Status code {response.status_code}")
+                log(f"FAIL - Health Check: Status code {response.status_code}")
                 return False
         except Exception as e:
-            print(f"FAIL - Health Check: {e}")
+            log(f"FAIL - Health Check: {e}")
             return False
     
-    def test_search_endpoint(self) -> bool:
+    async def test_search_endpoint(self) -> bool:
         """Test semantic search endpoint"""
         paramss = [
             {"q": "計算機圖形", "limit": 3},
@@ -44,19 +181,19 @@ class APITester:
         ]
 
         
-        print("\nTesting search endpoint...")
+        log("\nTesting search endpoint...")
         all_passed = True
         
-        for params in paramss:
+        # Send every query at once; the responses are checked in query order
+        responses = await self._get_many([("/search", params) for params in paramss])
+        
+        for params, response in zip(paramss, responses):
             try:
-                response = requests.get(
-                    f"{self.base_url}/search",
-                    params=params,
-                    timeout=10
-                )
+                if isinstance(response, Exception):
+                    raise response
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = self._json(response)
                     results = data.get("results", [])
                     if results and len(results) > 0:
                         best_match = results[0]
@@ -66,216 +203,223 @@ class APITester:
                         time_slots = best_match.get('time_slots', [])
                         if time_slots:
                             first_slot = time_slots[0]
-                            if not (isinstance(first_slot.get('weekday'), int) and \
-                                    isinstance(first_slot.get('period'), str) and \
-                                    isinstance(first_slot.get('classroom'), str)):
-                                print(f"  WARN - Query: '{params}' -> Time_slots structure incorrect: {first_slot}")
+                            if not valid_time_slot(first_slot):
+                                log(f"  WARN - Query: '{params}' -> Time_slots structure incorrect: {first_slot}")
                                 # all_passed = False # Decide if this is a hard fail
                         elif best_match.get('id'): # if id exists, time_slots should ideally exist, even if empty
-                            print(f"  WARN - Query: '{params}' -> '{name}' has no time_slots array.")
+                            log(f"  WARN - Query: '{params}' -> '{name}' has no time_slots array.")
 
-                        print(f"  PASS - Query: '{params}' -> '{name}' (ID: {best_match.get('id')}, Score: {score:.3f})")
+                        log(f"  PASS - Query: '{params}' -> '{name}' (ID: {best_match.get('id')}, Score: {score:.3f})")
                     else:
-                        print(f"  FAIL - Query: '{params}' -> No results")
+                        log(f"  FAIL - Query: '{params}' -> No results")
                         all_passed = False
                 else:
-                    print(f"  FAIL - Query: '{params}' -> Status {response.status_code}, Response: {response.text}")
+                    log(f"  FAIL - Query: '{params}' -> Status {response.status_code}, Response: {response.text}")
                     all_passed = False
                     
             except Exception as e:
-                print(f"  FAIL - Query: '{params}' -> Error: {e}")
+                log(f"  FAIL - Query: '{params}' -> Error: {e}")
                 all_passed = False
         
         return all_passed
     
-    def test_course_detail(self) -> bool:
+    async def test_course_detail(self) -> bool:
         """Test course detail endpoint"""
         try:
-            # First get a course code from search
-            search_response = requests.get(
-                f"{self.base_url}/search",
-                params={"q": "計算機圖形", "limit": 1},
-                timeout=10
-            )
+            # First get a course code from search; test_search_endpoint sends the
+            # same query, so this shares its response
+            search_response = await self._search({"q": "計算機圖形", "limit": 3})
             
             if search_response.status_code == 200:
-                search_data = search_response.json()
+                search_data = self._json(search_response)
                 search_results = search_data.get("results", [])
                 if search_results and len(search_results) > 0:
                     course_code = search_results[0].get('code')
                     if not course_code:
-                        print("FAIL - Course Detail: Could not retrieve a valid course code from search.")
+                        log("FAIL - Course Detail: Could not retrieve a valid course code from search.")
                         return False
                     
                     # Test course detail endpoint
-                    detail_response = requests.get(f"{self.base_url}/course/{course_code}", timeout=5)
+                    detail_response = await self._get(f"/course/{course_code}")
                     
                     if detail_response.status_code == 200:
-                        course_data = detail_response.json()
+                        course_data = self._json(detail_response)
                         course_name = course_data.get('name', 'Unknown')
                         course_id = course_data.get('id', 'N/A')
                         # Basic check for new fields
                         if not (course_data.get('identifier') and course_data.get('teacher_name') and course_data.get('host_department') and course_data.get('credits') is not None):
-                            print(f"FAIL - Course Detail: Missing some new fields for {course_name} (ID: {course_id})")
+                            log(f"FAIL - Course Detail: Missing some new fields for {course_name} (ID: {course_id})")
                             return False
                         # Check time_slots structure
                         time_slots = course_data.get('time_slots', [])
                         if time_slots:
                             first_slot = time_slots[0]
-                            if not (isinstance(first_slot.get('weekday'), int) and \
-                                    isinstance(first_slot.get('period'), str) and \
-                                    isinstance(first_slot.get('classroom'), str)):
-                                print(f"FAIL - Course Detail: Time_slots structure incorrect for {course_name} (ID: {course_id}): {first_slot}")
+                            if not valid_time_slot(first_slot):
+                                log(f"FAIL - Course Detail: Time_slots structure incorrect for {course_name} (ID: {course_id}): {first_slot}")
                                 return False
                         elif course_id != 'N/A': # if id exists, time_slots should ideally exist, even if empty
-                             print(f"WARN - Course Detail: '{course_name}' (ID: {course_id}) has no time_slots array.")
+                             log(f"WARN - Course Detail: '{course_name}' (ID: {course_id}) has no time_slots array.")
 
-                        print(f"PASS - Course Detail: Retrieved '{course_name}' (ID: {course_id}, Code: {course_code})")
+                        log(f"PASS - Course Detail: Retrieved '{course_name}' (ID: {course_id}, Code: {course_code})")
                         return True
                     else:
-                        print(f"FAIL - Course Detail: Status {detail_response.status_code}, Response: {detail_response.text}")
+                        log(f"FAIL - Course Detail: Status {detail_response.status_code}, Response: {detail_response.text}")
                         return False
                 else:
-                    print("FAIL - Course Detail: No courses found from search for testing")
+                    log("FAIL - Course Detail: No courses found from search for testing")
                     return False
             else:
-                print(f"FAIL - Course Detail: Search failed with status {search_response.status_code}, Response: {search_response.text}")
+                log(f"FAIL - Course Detail: Search failed with status {search_response.status_code}, Response: {search_response.text}")
                 return False
                 
         except Exception as e:
-            print(f"FAIL - Course Detail: {e}")
+            log(f"FAIL - Course Detail: {e}")
             return False
     
-    def test_schedule_generation(self) -> bool:
+    async def test_schedule_generation(self) -> bool:
         """Test schedule generation endpoint"""
         try:
             # Test with sample course codes
             # Get some course codes first to ensure they exist
-            search_response = requests.get(f"{self.base_url}/search", params={"q": "資訊工程", "limit": 5}, timeout=10)
+            search_response = await self._search({"q": "資訊工程", "limit": 5})
             if search_response.status_code != 200:
-                print(f"FAIL - Schedule Generation: Could not fetch course codes for test. Status: {search_response.status_code}")
+                log(f"FAIL - Schedule Generation: Could not fetch course codes for test. Status: {search_response.status_code}")
                 return False
             
-            search_data = search_response.json()
-            course_codes = [course.get('code') for course in search_data.get("results", []) if course.get('code')]
+            search_data = self._json(search_response)
+            # Only the first three codes are scheduled, so stop collecting there
+            course_codes = list(islice(
+                (course['code'] for course in search_data.get("results", ()) if course.get('code')), 3
+            ))
             
             if not course_codes or len(course_codes) < 2:
-                print("FAIL - Schedule Generation: Not enough valid course codes retrieved for test.")
+                log("FAIL - Schedule Generation: Not enough valid course codes retrieved for test.")
                 return False
                 
             test_schedule_request = {
-                "course_codes": course_codes[:3],
+                "course_codes": course_codes,
                 "max_credits": 10
             }
             
-            response = requests.post(
-                f"{self.base_url}/schedule",
-                json=test_schedule_request,
-                timeout=15
+            response = await self._client.post(
+                "/schedule",
+                content=orjson.dumps(test_schedule_request),
+                headers=JSON_HEADERS
             )
             
             if response.status_code == 200:
-                schedule_data = response.json()
+                schedule_data = self._json(response)
                 courses = schedule_data.get('schedule', [])
                 conflicts = schedule_data.get('conflicts', [])
                 
-                print(f"PASS - Schedule Generation: {len(courses)} courses, {len(conflicts)} conflicts")
+                log(f"PASS - Schedule Generation: {len(courses)} courses, {len(conflicts)} conflicts")
                 
                 # Show sample courses in schedule
                 if courses:
-                    print(f"  Sample courses: {[c.get('name', 'Unknown')[:30] for c in courses[:3]]}")
+                    log(f"  Sample courses: {[c.get('name', 'Unknown')[:30] for c in islice(courses, 3)]}")
                     # Check structure of a sample course in schedule
                     sample_course_in_schedule = courses[0]
                     if not (sample_course_in_schedule.get('identifier') and sample_course_in_schedule.get('teacher_name')):
-                        print(f"  WARN - Schedule Generation: Sample course in schedule might be missing new fields.")
+                        log(f"  WARN - Schedule Generation: Sample course in schedule might be missing new fields.")
                     time_slots_in_schedule = sample_course_in_schedule.get('time_slots', [])
                     if time_slots_in_schedule:
                         first_slot_schedule = time_slots_in_schedule[0]
-                        if not (isinstance(first_slot_schedule.get('weekday'), int) and \
-                                isinstance(first_slot_schedule.get('period'), str)):
-                            print(f"  WARN - Schedule Generation: Time_slots structure in scheduled course incorrect.")
+                        if not valid_time_slot(first_slot_schedule, SCHEDULED_SLOT_FIELDS):
+                            log(f"  WARN - Schedule Generation: Time_slots structure in scheduled course incorrect.")
                 
                 return True
             else:
-                print(f"FAIL - Schedule Generation: Status {response.status_code}, Response: {response.text}")
+                log(f"FAIL - Schedule Generation: Status {response.status_code}, Response: {response.text}")
                 return False
                 
         except Exception as e:
-            print(f"FAIL - Schedule Generation: {e}")
+            log(f"FAIL - Schedule Generation: {e}")
             return False
     
-    def test_recommendations(self) -> bool:
+    async def test_recommendations(self) -> bool:
         """Test course recommendation endpoint"""
         try:
-            test_recommendation_request = {
-                "query": "artificial intelligence",
-                "max_credits": 15,
-                "semesters": ["113-2"]
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/recommend",
-                json=test_recommendation_request,
-                timeout=20
+            response = await self._client.post(
+                "/recommend",
+                content=RECOMMEND_REQUEST_BODY,
+                headers=JSON_HEADERS
             )
             
             if response.status_code == 200:
-                recommendations_data = response.json()
+                recommendations_data = self._json(response)
                 recommended_schedule = recommendations_data.get('recommended_schedule', [])
                 if recommended_schedule and len(recommended_schedule) > 0:
-                    print(f"PASS - Recommendations: Found {len(recommended_schedule)} suggestions in schedule")
+                    log(f"PASS - Recommendations: Found {len(recommended_schedule)} suggestions in schedule")
                     
                     # Show top recommendations
                     for i, rec in enumerate(recommended_schedule[:3], 1):
                         name = rec.get('name', 'Unknown')
                         credits = rec.get('credits', 0) # Changed from credit
                         course_id = rec.get('id', 'N/A')
-                        print(f"  {i}. {name} (ID: {course_id}, Credits: {credits})")
+                        log(f"  {i}. {name} (ID: {course_id}, Credits: {credits})")
                     
                     # Check structure of a sample recommended course
                     sample_rec_course = recommended_schedule[0]
                     if not (sample_rec_course.get('identifier') and sample_rec_course.get('teacher_name')):
-                        print(f"  WARN - Recommendations: Sample recommended course might be missing new fields.")
+                        log(f"  WARN - Recommendations: Sample recommended course might be missing new fields.")
                     time_slots_rec = sample_rec_course.get('time_slots', [])
                     if time_slots_rec:
                         first_slot_rec = time_slots_rec[0]
-                        if not (isinstance(first_slot_rec.get('weekday'), int) and \
-                                isinstance(first_slot_rec.get('period'), str)):
-                            print(f"  WARN - Recommendations: Time_slots structure in recommended course incorrect.")
+                        if not valid_time_slot(first_slot_rec, SCHEDULED_SLOT_FIELDS):
+                            log(f"  WARN - Recommendations: Time_slots structure in recommended course incorrect.")
                     
                     return True
                 else:
-                    print("FAIL - Recommendations: No recommendations found in schedule")
+                    log("FAIL - Recommendations: No recommendations found in schedule")
                     return False
             else:
-                print(f"FAIL - Recommendations: Status {response.status_code}, Response: {response.text}")
+                log(f"FAIL - Recommendations: Status {response.status_code}, Response: {response.text}")
                 return False
                 
         except Exception as e:
-            print(f"FAIL - Recommendations: {e}")
+            log(f"FAIL - Recommendations: {e}")
             return False
     
-    def run_all_tests(self) -> bool:
+    async def run_all_tests(self) -> bool:
         """Run complete API test suite"""
         print("=" * 50)
         print("API TEST SUITE")
         print("=" * 50)
         
+        # Critical tests are preconditions for the rest: they run first, and the
+        # suite stops if one of them fails
         tests = [
-            ("Health Check", self.test_health_check),
-            ("Search Endpoint", self.test_search_endpoint),
-            ("Course Detail", self.test_course_detail),
-            ("Schedule Generation", self.test_schedule_generation),
-            ("Recommendations", self.test_recommendations)
+            ("Health Check", self.test_health_check, True),
+            ("Search Endpoint", self.test_search_endpoint, False),
+            ("Course Detail", self.test_course_detail, False),
+            ("Schedule Generation", self.test_schedule_generation, False),
+            ("Recommendations", self.test_recommendations, False)
         ]
         
         passed = 0
         total = len(tests)
         
-        for test_name, test_func in tests:
-            print(f"\n[{test_name}]")
-            if test_func():
-                passed += 1
+        self.suite_deadline = time.monotonic() + self.suite_timeout
+        critical_tests = [(test_name, test_func) for test_name, test_func, critical in tests if critical]
+        other_tests = [(test_name, test_func) for test_name, test_func, critical in tests if not critical]
+        
+        for test_name, test_func in critical_tests:
+            result, lines = await asyncio.create_task(self._run_buffered(test_name, test_func))
+            sys.stdout.write("\n".join([f"\n[{test_name}]", *lines]) + "\n")
+            if not result:
+                print("ABORT - critical test failed; skipping the remaining tests")
+                break
+            passed += 1
+        else:
+            # The other tests are independent, so run them at once and report in order
+            outcomes = await asyncio.gather(
+                *(self._run_buffered(test_name, test_func) for test_name, test_func in other_tests)
+            )
+            for (test_name, _), (result, lines) in zip(other_tests, outcomes):
+                # One write per test instead of one per line
+                sys.stdout.write("\n".join([f"\n[{test_name}]", *lines]) + "\n")
+                if result:
+                    passed += 1
         
         print("\n" + "=" * 50)
         print(f"API TEST RESULTS: {passed}/{total} tests passed")
@@ -288,16 +432,22 @@ class APITester:
             return False
 
 
+async def run_suite(api_base_url: str = "http://localhost:8000") -> bool:
+    """Run the API test suite against the service at api_base_url"""
+    async with APITester(api_base_url) as tester:
+        # Start as soon as the service answers instead of after a fixed delay
+        if not await tester.wait_ready():
+            print(f"FAIL - API at {api_base_url} did not become ready")
+            return False
+        return await tester.run_all_tests()
+
+
 def main():
     """Run the API test suite"""
     print("Starting API tests...")
     print("Make sure the API service is running: python api/api.py")
     
-    # Wait a moment for potential startup
-    time.sleep(1)
-    
-    tester = APITester()
-    success = tester.run_all_tests()
+    success = asyncio.run(run_suite())
     
     if success:
         print("\nAPI service is ready for integration!")
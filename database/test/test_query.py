@@ -4,37 +4,48 @@ Vector Database Query Test Suite
 Tests the course vector database functionality
 """
 
+import asyncio
 import sys
 import os
 import re
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, models
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from database.config import collection_name, vector_names, model_name
+from database.query_model import load_query_model
+from database.test.buffered_output import log, run_buffered
 
 
 class VectorDBTester:
-    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333):
+    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333, qdrant_grpc_port: int = 6334):
         """Initialize tester"""
         self.client = None
         self.model = None
+        # One get_collections request shared by the tests that need it
+        self._collections_task = None
         self.qdrant_host = qdrant_host
         self.qdrant_port = qdrant_port
-        self.collection_name = "ntu_courses"
+        self.qdrant_grpc_port = qdrant_grpc_port
+        self.collection_name = collection_name
+        # Tests search the course-name vector of each point
+        self.vector_name = vector_names["name"]
         
         print("Vector Database Test Suite")
         print("=" * 40)
     
-    def lazy_init(self):
+    async def lazy_init(self):
         """Initialize connections"""
         if self.client is None:
             print("Connecting to Qdrant...")
-            self.client = QdrantClient(host=self.qdrant_host, port=self.qdrant_port, check_compatibility=False)
+            # gRPC sends query vectors as packed floats rather than JSON text
+            self.client = AsyncQdrantClient(host=self.qdrant_host, port=self.qdrant_port, grpc_port=self.qdrant_grpc_port,
+                                            prefer_grpc=True, check_compatibility=False)
         
         if self.model is None:
-            model_name = "BAAI/bge-m3"
             print(f"Attempting to load embedding model: {model_name} (this may take a moment)...")
             try:
-                self.model = SentenceTransformer(model_name)
+                self.model = load_query_model(model_name)
                 print(f"Successfully loaded embedding model: {model_name}.")
             except Exception as e:
                 print(f"ERROR: Failed to load SentenceTransformer model '{model_name}'. Error: {e}")
@@ -42,160 +53,167 @@ class VectorDBTester:
                 # Consider exiting or re-raising if model is critical for all tests.
                 sys.exit(f"Critical error: Model {model_name} could not be loaded.")
     
-    def test_connection(self) -> bool:
+    async def _search_batch(self, query_vectors, query_filter=None, limit=3, with_payload=True):
+        """Search the course-name vector for every query in one request"""
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=query_vector,
+                    using=self.vector_name,
+                    filter=query_filter,
+                    limit=limit,
+                    with_payload=with_payload
+                )
+                for query_vector in query_vectors
+            ]
+        )
+        return [response.points for response in responses]
+    
+    async def _get_collections(self):
+        """get_collections, sent once and shared even while it is in flight"""
+        if self._collections_task is None:
+            self._collections_task = asyncio.ensure_future(self.client.get_collections())
+        return await asyncio.shield(self._collections_task)
+    
+    async def test_connection(self) -> bool:
         """Test Qdrant connection"""
         try:
-            self.lazy_init()
-            info = self.client.get_collections()
-            print("PASS - Qdrant connection successful")
+            await self.lazy_init()
+            info = await self._get_collections()
+            log("PASS - Qdrant connection successful")
             return True
         except Exception as e:
-            print(f"FAIL - Qdrant connection failed: {e}")
+            log(f"FAIL - Qdrant connection failed: {e}")
             return False
     
-    def test_collection_exists(self) -> bool:
+    async def test_collection_exists(self) -> bool:
         """Test if courses collection exists"""
         try:
-            collections = self.client.get_collections()
+            collections = await self._get_collections()
             collection_names = [c.name for c in collections.collections]
             
             if self.collection_name in collection_names:
-                print(f"PASS - Collection '{self.collection_name}' exists")
+                log(f"PASS - Collection '{self.collection_name}' exists")
                 return True
             else:
-                print(f"FAIL - Collection '{self.collection_name}' not found")
+                log(f"FAIL - Collection '{self.collection_name}' not found")
                 return False
         except Exception as e:
-            print(f"FAIL - Collection check failed: {e}")
+            log(f"FAIL - Collection check failed: {e}")
             return False
     
-    def test_data_count(self) -> bool:
+    async def test_data_count(self) -> bool:
         """Test if data is present in collection"""
         try:
-            result = self.client.count(collection_name=self.collection_name)
+            result = await self.client.count(collection_name=self.collection_name)
             count = result.count
             
             if count > 0:
-                print(f"PASS - Found {count} courses in database")
+                log(f"PASS - Found {count} courses in database")
                 return True
             else:
-                print("FAIL - No courses found in database")
+                log("FAIL - No courses found in database")
                 return False
         except Exception as e:
-            print(f"FAIL - Data count check failed: {e}")
+            log(f"FAIL - Data count check failed: {e}")
             return False
     
-    def test_semantic_search(self) -> bool:
+    async def test_semantic_search(self) -> bool:
         """Test semantic search functionality"""
         try:
-        test_queries = [
+            test_queries = [
                 "機器學習",
                 "計算機圖形",
                 "資訊安全",
                 "人工智慧"
-        ]
-        
-        for query in test_queries:
-                query_vector = self.model.encode(query).tolist()
-                
-                try:
-                    # Try query_points (newer method)
-                    results = self.client.query_points(
-                        collection_name=self.collection_name,
-                        query=query_vector,
-                        limit=3
-                    ).points
-                except Exception:
-                    # Fallback to search (older method)
-                    results = self.client.search(
-                            collection_name=self.collection_name,
-                            query_vector=query_vector,
-                            limit=3
-                        )
-                
+            ]
+
+            # One encode call runs all queries through the model as a single batch
+            # Encoding runs in a worker thread so the other tests' requests proceed
+            query_vectors = await asyncio.to_thread(
+                self.model.encode,
+                test_queries,
+                batch_size=len(test_queries),
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+
+            # All queries go to Qdrant in one request
+            # Only the course name is reported, so only it is sent back
+            batch_results = await self._search_batch(query_vectors, limit=3, with_payload=["name"])
+
+            for query, results in zip(test_queries, batch_results):
+
                 if results:
                     top_result = results[0]
                     course_name = top_result.payload.get("name", "Unknown")
                     score = float(top_result.score)
-                    print(f"PASS - Query '{query}' → {course_name} (score: {score:.3f})")
+                    log(f"PASS - Query '{query}' → {course_name} (score: {score:.3f})")
                 else:
-                    print(f"FAIL - No results for query '{query}'")
+                    log(f"FAIL - No results for query '{query}'")
                     return False
-            
-                    return True
-                
+
+            return True
+
         except Exception as e:
-            print(f"FAIL - Semantic search test failed: {e}")
+            log(f"FAIL - Semantic search test failed: {e}")
             return False
     
-    def test_metadata_filtering(self) -> bool:
+    async def test_metadata_filtering(self) -> bool:
         """Test metadata filtering functionality"""
         try:
             # Test semester filtering
-            query_vector = self.model.encode("計算機").tolist()
-            
-            from qdrant_client import models
+            query_vector = await asyncio.to_thread(
+                self.model.encode, "計算機", convert_to_numpy=True, normalize_embeddings=True
+            )
             
-            try:
-                # Try query_points (newer method)
-                results = self.client.query_points(
-                    collection_name=self.collection_name,
-                    query=query_vector,
-                    query_filter=models.Filter(
-                        must=[models.FieldCondition(
-                            key="semester",
-                            match=models.MatchValue(value="113-2")
-                        )]
-                    ),
-                    limit=3
-                ).points
-            except Exception:
-                # Fallback to search (older method)
-                results = self.client.search(
-                collection_name=self.collection_name,
-                    query_vector=query_vector,
-                    query_filter=models.Filter(
+            results = (await self._search_batch(
+                [query_vector],
+                query_filter=models.Filter(
                     must=[models.FieldCondition(
                         key="semester",
                         match=models.MatchValue(value="113-2")
                     )]
                 ),
-                    limit=3
-            )
+                limit=3,
+                # Only the number of hits is checked
+                with_payload=False
+            ))[0]
             
             if results:
-                print(f"PASS - Metadata filtering found {len(results)} courses")
+                log(f"PASS - Metadata filtering found {len(results)} courses")
                 return True
             else:
-                print("FAIL - No results from metadata filtering")
+                log("FAIL - No results from metadata filtering")
                 return False
                 
         except Exception as e:
-            print(f"FAIL - Metadata filtering test failed: {e}")
+            log(f"FAIL - Metadata filtering test failed: {e}")
             return False
     
-    def run_all_tests(self) -> bool:
+    async def run_all_tests(self) -> bool:
         """Run all tests and report summary"""
-        self.lazy_init()
+        await self.lazy_init()
         
         tests = [
-            self.test_connection,
-            self.test_collection_exists,
-            self.test_data_count,
-            self.test_semantic_search,
-            self.test_metadata_filtering
+            ("Database Connection", self.test_connection),
+            ("Collection Check", self.test_collection_exists),
+            ("Data Count", self.test_data_count),
+            ("Semantic Search", self.test_semantic_search),
+            ("Metadata Filtering", self.test_metadata_filtering)
         ]
         
+        # The tests only read from Qdrant, so run them at once and report in order
+        outcomes = await asyncio.gather(
+            *(run_buffered(test_name, test_func) for test_name, test_func in tests)
+        )
         results = []
-        
-        for test_name, test_func in tests:
+        for (test_name, _), (result, lines) in zip(tests, outcomes):
             print(f"\n{test_name}:")
-            try:
-                result = test_func()
-                results.append(result)
-            except Exception as e:
-                print(f"FAIL - {test_name} crashed: {e}")
-                results.append(False)
+            for line in lines:
+                print(line)
+            results.append(result)
         
         # Summary
         passed = sum(results)
@@ -213,39 +231,50 @@ class VectorDBTester:
 
     def display_results(self, results: List[Any], query: str):
         """Display search results in a readable format"""
-        print(f"\n--- Search Results for: '{query}' ---")
+        # Lines are collected and written in one call rather than one print each
+        lines = [f"\n--- Search Results for: '{query}' ---"]
         if not results:
-            print("No courses found.")
-            return
+            lines.append("No courses found.")
         
         for i, hit in enumerate(results):
             payload = hit.payload
-            print(f"\nResult {i+1}:")
-            print(f"  Name: {payload.get('name')}")
-            print(f"  ID: {payload.get('id')}")
-            print(f"  Identifier: {payload.get('identifier')}")
-            print(f"  Code: {payload.get('code')}")
-            print(f"  Teacher: {payload.get('teacher_name')}")
-            print(f"  Department: {payload.get('host_department')}")
-            print(f"  Credits: {payload.get('credits')}")
+            lines.append(f"\nResult {i+1}:")
+            lines.append(f"  Name: {payload.get('name')}")
+            lines.append(f"  ID: {payload.get('id')}")
+            lines.append(f"  Identifier: {payload.get('identifier')}")
+            lines.append(f"  Code: {payload.get('code')}")
+            lines.append(f"  Teacher: {payload.get('teacher_name')}")
+            lines.append(f"  Department: {payload.get('host_department')}")
+            lines.append(f"  Credits: {payload.get('credits')}")
             
             # Display new time_slots structure
             time_slots = payload.get('time_slots', [])
             if time_slots:
-                print("  Time Slots:")
+                lines.append("  Time Slots:")
                 for slot in time_slots:
-                    print(f"    - {slot}")
+                    lines.append(f"    - {slot}")
             else:
-                print("  Time Slots: Not available")
+                lines.append("  Time Slots: Not available")
 
-            print(f"  Notes: {payload.get('notes', 'N/A')}")
-            print(f"  Score: {hit.score:.4f}" if hasattr(hit, 'score') and hit.score is not None else "Score: N/A")
+            lines.append(f"  Notes: {payload.get('notes', 'N/A')}")
+            lines.append(f"  Score: {hit.score:.4f}" if hasattr(hit, 'score') and hit.score is not None else "Score: N/A")
+
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+async def run_suite() -> bool:
+    """Run the test suite and close the Qdrant connection afterwards"""
+    tester = VectorDBTester()
+    try:
+        return await tester.run_all_tests()
+    finally:
+        if tester.client is not None:
+            await tester.client.close()
 
 
 def main():
     """Main test execution"""
-    tester = VectorDBTester()
-    success = tester.run_all_tests()
+    success = asyncio.run(run_suite())
     
     if not success:
         sys.exit(1)
@@ -6,24 +6,58 @@ Allows interactive querying of the course vector database.
 
 import sys
 import re
+from collections import OrderedDict
+from operator import attrgetter
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+import numpy as np
+from qdrant_client import QdrantClient, models
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from database.config import collection_names, weights
+from database.config import (
+    collection_name, vector_names, weights, model_name, max_seq_length, embedding_cache_dir
+)
+from database.embedding_cache import EmbeddingCache
+from database.query_model import load_query_model, query_model_tag
+
+# Most recent queries whose embeddings and results are kept
+QUERY_CACHE_SIZE = 128
+# Frequent searches whose embeddings are prepared when the model is loaded
+COMMON_QUERIES = ("機器學習", "計算機圖形", "資訊安全", "人工智慧", "計算機")
+# A query whose embedding is at least this similar to a cached one reuses its results
+SEMANTIC_HIT_THRESHOLD = 0.97
+
+# Payload fields perform_search returns and display_results shows; the rest of
+# the payload is not sent back by Qdrant
+RESULT_FIELDS = ["id", "name", "identifier", "teacher_name", "host_department", "code", "credits", "time_slots", "notes"]
+
+# (payload, score) of a search hit in one call
+_hit_fields = attrgetter("payload", "score")
+
+
+def _query_cache_path() -> str:
+    """Disk cache file for query embeddings of the model load_query_model loads"""
+    return os.path.join(embedding_cache_dir, f"queries-{query_model_tag(model_name)}-{max_seq_length}.npz")
+
 
 class InteractiveQuery:
-    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333):
+    def __init__(self, qdrant_host: str = "localhost", qdrant_port: int = 6333, qdrant_grpc_port: int = 6334):
         """Initialize interactive query tool"""
         self.client = None
         self.model = None
         self.qdrant_host = qdrant_host
         self.qdrant_port = qdrant_port
-        self.collection_names = collection_names
+        self.qdrant_grpc_port = qdrant_grpc_port
+        self.collection_name = collection_name
+        self.vector_names = vector_names
         self.weights = weights
+        # Query embeddings by whitespace-normalized text, and the results of recent
+        # searches as (embedding, top_k, results), both least recently used first
+        self._emb_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._result_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # Query embeddings from earlier sessions, saved when the loop exits
+        self._disk_cache = EmbeddingCache(_query_cache_path())
         
         print("Interactive Course Query Tool")
         print("Type 'exit' or 'quit' to stop.")
@@ -35,24 +69,40 @@ class InteractiveQuery:
         if self.client is None:
             try:
                 print("Connecting to Qdrant...")
-                self.client = QdrantClient(host=self.qdrant_host, port=self.qdrant_port, check_compatibility=False)
-                self.client.get_collections() # Test connection
+                self.client = QdrantClient(host=self.qdrant_host, port=self.qdrant_port, grpc_port=self.qdrant_grpc_port,
+                                           prefer_grpc=True, check_compatibility=False)
+                self.client.info() # Test connection; unlike get_collections, independent of collection count
                 print("Qdrant connection successful.")
             except Exception as e:
-                print(f"Error: Could not connect to Qdrant at {self.qdrant_host}:{self.qdrant_port}. Please ensure Qdrant is running.")
+                print(f"Error: Could not connect to Qdrant at {self.qdrant_host}:{self.qdrant_grpc_port}. Please ensure Qdrant is running.")
                 print(f"Details: {e}")
                 sys.exit(1)
         
         if self.model is None:
             try:
-                model_name = "BAAI/bge-m3"
                 print(f"Attempting to load embedding model: {model_name} (this may take a moment)...")
-                self.model = SentenceTransformer(model_name)
+                self.model = load_query_model(model_name)
                 print(f"Successfully loaded embedding model: {model_name}.")
             except Exception as e:
                 print(f"Error: Could not load sentence-transformer model '{model_name}'.")
                 print(f"Details: {e}")
                 sys.exit(1)
+            # One dummy encode, as the API's warmup does, so the first query is not
+            # slowed by the runtime's one-off initialization
+            self.model.encode("warmup")
+            self._preload_common_queries()
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Embed queries, reusing the ones saved by earlier sessions"""
+        return self._disk_cache.encode(
+            texts,
+            lambda missing: self.model.encode(missing, convert_to_numpy=True, normalize_embeddings=True)
+        )
+
+    def _preload_common_queries(self):
+        """Embed COMMON_QUERIES in one batch so searching for them skips the model"""
+        for query, query_vector in zip(COMMON_QUERIES, self._encode_queries(list(COMMON_QUERIES))):
+            self._cache_put(self._emb_cache, query, query_vector)
 
     def perform_search(self, query_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Perform semantic search and return results"""
@@ -60,91 +110,139 @@ class InteractiveQuery:
             print("Error: Qdrant client or model not initialized.")
             return []
     
-        query_vector = self.model.encode(query_text).tolist()
-
-        course_scrores = {}
-        course_data = {}
-        # try:
-        now_len = 0
-        for attr, collection_name in self.collection_names.items():
-            now_len += 1
-            results = self.client.search(
-                collection_name = collection_name,
-                query_vector=query_vector,
-                limit = top_k*len(self.collection_names),
-                with_payload=True,
-            )
-            for point in results:
-                course_id = point.payload['id']
-                score = float(point.score) * self.weights[attr]
-                if course_id not in course_scrores:
-                    course_scrores[course_id] = []
-                    course_data[course_id] = point.payload
-                course_scrores[course_id].append(score)
-            
-            for course_id, scores in course_scrores.items():
-                if len(scores) < now_len:
-                    course_scrores[course_id].append(0.0)
-        
-        sorted_courses = sorted(course_scrores.items(), key=lambda x: sum(x[1]), reverse=True)
+        key = " ".join(query_text.split())
+        query_vector = self._cache_get(self._emb_cache, key)
+        if query_vector is None:
+            query_vector = self._encode_queries([key])[0]
+            self._cache_put(self._emb_cache, key, query_vector)
+
+        # Embeddings are normalized, so one matrix product gives the cosine
+        # similarity to every cached query
+        entries = [entry for entry in self._result_cache.values() if entry[1] == top_k]
+        if entries:
+            similarities = np.stack([entry[0] for entry in entries]) @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= SEMANTIC_HIT_THRESHOLD:
+                return entries[best][2]
+
+        # The searches of all named vectors go to Qdrant in one request
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=query_vector,
+                    using=vector_name,
+                    limit=top_k*len(self.vector_names),
+                    with_payload=RESULT_FIELDS
+                )
+                for vector_name in self.vector_names.values()
+            ]
+        )
+        batch_results = [response.points for response in responses]
+
+        # One row per course and one column per attribute; a course missing from an
+        # attribute's hits keeps 0.0 in that column
+        course_rows = {}
+        course_data = []
+        hit_rows, hit_cols, hit_scores = [], [], []
+        for col, results in enumerate(batch_results):
+            for payload, score in map(_hit_fields, results):
+                row = course_rows.get(payload['id'])
+                if row is None:
+                    row = course_rows[payload['id']] = len(course_data)
+                    course_data.append(payload)
+                hit_rows.append(row)
+                hit_cols.append(col)
+                hit_scores.append(score)
+        course_scores = np.zeros((len(course_data), len(self.vector_names)))
+        course_scores[hit_rows, hit_cols] = hit_scores
+        course_scores *= np.array([self.weights[attr] for attr in self.vector_names])
+
+        # Only the top_k courses are returned, so only they are sorted
+        totals = course_scores.sum(axis=1)
+        if len(totals) > top_k:
+            top_rows = np.argpartition(-totals, top_k)[:top_k]
+        else:
+            top_rows = np.arange(len(totals))
+        order = top_rows[np.argsort(-totals[top_rows], kind="stable")]
         print("Sorted course scores and names:")
-        for course_id, scores in sorted_courses:
-            name = course_data[course_id]["name"]
-            print(f"Name: {name}, Scores: {scores}")
+        for row in order:
+            print(f"Name: {course_data[row]['name']}, Scores: {course_scores[row].tolist()}")
         final_results = []
-        for course_id, score in sorted_courses[:top_k]:
-            course = course_data[course_id]
-            course["score"] = score
+        for row in order:
+            course = course_data[row]
+            course["score"] = course_scores[row].tolist()
             final_results.append(course)
         
+        self._cache_put(self._result_cache, key, (query_vector, top_k, final_results))
         return final_results
 
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key: str):
+        """Look up key and mark it as most recently used"""
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: str, value):
+        """Store value under key, evicting the least recently used entry when full"""
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > QUERY_CACHE_SIZE:
+            cache.popitem(last=False)
+
     def display_results(self, results: List[Dict[str, Any]]):
         """Display search results in a user-friendly format"""
         if not results:
             print("No results found or error in search.")
             return
 
-        print("\nSearch Results:")
-        print("-" * 30)
+        lines = ["\nSearch Results:", "-" * 30]
         for i, course in enumerate(results, 1):
-            print(f"{i}. {course['name']} (ID: {course['id']}, Score: {course['score']})")
-            print(f"   Identifier: {course['identifier']}")
-            print(f"   Teacher: {course['teacher_name']}")
-            print(f"   Department: {course['host_department']}")
-            print(f"   Code: {course['code']}")
-            print(f"   Credits: {course['credits']}")
+            lines.append(f"{i}. {course['name']} (ID: {course['id']}, Score: {course['score']})")
+            lines.append(f"   Identifier: {course['identifier']}")
+            lines.append(f"   Teacher: {course['teacher_name']}")
+            lines.append(f"   Department: {course['host_department']}")
+            lines.append(f"   Code: {course['code']}")
+            lines.append(f"   Credits: {course['credits']}")
             
             time_slots = course.get('time_slots', [])
             if time_slots:
-                print("   Time Slots:")
+                lines.append("   Time Slots:")
                 for slot in time_slots:
                     # Simple representation, can be enhanced with weekday mapping if desired
-                    print(f"     - Day: {slot.get('weekday')}, Period: {slot.get('period')}, Classroom: {slot.get('classroom', 'N/A')}")
+                    lines.append(f"     - Day: {slot.get('weekday')}, Period: {slot.get('period')}, Classroom: {slot.get('classroom', 'N/A')}")
             else:
-                print("   Time Slots: Not available")
+                lines.append("   Time Slots: Not available")
             
-            print(f"   Notes: {course['notes']}")
-            print("-" * 30)
+            lines.append(f"   Notes: {course['notes']}")
+            lines.append("-" * 30)
+
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def run_interactive_loop(self):
         """Run the main interactive query loop"""
-        while True:
-            try:
-                query = input("\nEnter your search query: ")
-                if query.lower() in ['exit', 'quit']:
-                    print("Exiting interactive query tool.")
+        try:
+            while True:
+                try:
+                    query = input("\nEnter your search query: ")
+                    if query.lower() in ['exit', 'quit']:
+                        print("Exiting interactive query tool.")
+                        break
+                    if not query.strip():
+                        continue
+
+                    results = self.perform_search(query)
+                    self.display_results(results)
+                except KeyboardInterrupt:
+                    print("\nExiting due to KeyboardInterrupt.")
                     break
-                if not query.strip():
-                    continue
-
-                results = self.perform_search(query)
-                self.display_results(results)
-            except KeyboardInterrupt:
-                print("\nExiting due to KeyboardInterrupt.")
-                break
-            except Exception as e:
-                print(f"An unexpected error occurred: {e}")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
+        finally:
+            self._disk_cache.save()
 
 def main():
     """Main execution function"""
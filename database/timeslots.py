@@ -0,0 +1,33 @@
+"""
+Course time slot helpers shared by the ingest scripts and the API
+"""
+
+from typing import Dict, List
+
+# NTU timetable period labels. Each (weekday, period) slot maps to one bit of a
+# course's slot mask, so two courses conflict iff their masks share a bit.
+PERIOD_INDEX = {period: i for i, period in enumerate(
+    ("0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "A", "B", "C", "D"))}
+PERIOD_BITS = 16
+
+
+def slot_mask(time_slots: List[Dict]) -> int:
+    """Encode time_slots as a bitmask with one bit per (weekday, period)"""
+    mask = 0
+    for slot in time_slots:
+        weekday = slot.get("weekday")
+        period = PERIOD_INDEX.get(str(slot.get("period")))
+        if weekday is not None and period is not None:
+            mask |= 1 << (int(weekday) * PERIOD_BITS + period)
+    return mask
+
+
+def course_slot_mask(course: Dict) -> int:
+    """Slot mask of a course payload, preferring the one stored at ingest time
+
+    Masks need more than 64 bits, so the payload stores them as hex strings.
+    """
+    stored = course.get("slot_mask")
+    if stored is not None:
+        return int(stored, 16)
+    return slot_mask(course.get("time_slots", []))
@@ -1,9 +1,15 @@
 from requests import Session
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import os
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 from tqdm import tqdm
 
+# Course pages fetched at once; each fetch mostly waits on the network
+CRAWL_WORKERS = 16
+
 
 class NTUClassCrawler(object):
     def __init__(self):
@@ -23,6 +29,16 @@ class NTUClassCrawler(object):
             'sec-ch-ua-mobile': '?0',
             'sec-ch-ua-platform': '"macOS"',
         })
+        # Keep one pooled connection per worker instead of reconnecting, and retry
+        # pages the server briefly fails to serve under concurrent load. Once retries
+        # run out the last response is returned rather than raised, so the caller
+        # reports its status and the crawl moves on
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=CRAWL_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                              raise_on_status=False)
+        ))
 
     def pre_load_ntu_course_website(self):
         response = self.session.get('https://course.ntu.edu.tw/search/quick?s=112-2')
@@ -79,19 +95,20 @@ class NTUClassCrawler(object):
         response.encoding = 'utf-8'
         course_info = {}
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            ul = soup.find('ul', class_='grow')
+            # lexbor builds the tree in C without a Python object per element
+            tree = LexborHTMLParser(response.text)
+            ul = tree.css_first('ul.grow')
             if ul:
-                lis = ul.find_all('li', recursive=False)
+                lis = [child for child in ul.iter() if child.tag == 'li']
 
                 for li in lis:
-                    title_div = li.find('div', class_='group')
-                    content_div = li.find('div', class_='prose')
+                    title_div = li.css_first('div.group')
+                    content_div = li.css_first('div.prose')
 
                     if title_div:
-                        title = title_div.get_text(strip=True)
+                        title = title_div.text(strip=True)
                         if content_div:
-                            content = content_div.get_text(strip=True)
+                            content = content_div.text(strip=True)
                         else:
                             content = None
                         course_info[title] = content
@@ -101,6 +118,19 @@ class NTUClassCrawler(object):
         return course_info
 
 
+def load_saved_info(semester, course_serial):
+    """Page info an earlier run saved for this course, or None"""
+    path = f'data/{semester}/{course_serial}.json'
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        try:
+            # A failed fetch is saved with empty info and is tried again
+            return orjson.loads(f.read()).get('info') or None
+        except orjson.JSONDecodeError:
+            return None
+
+
 if __name__ == '__main__':
     crawler = NTUClassCrawler()
     crawler.pre_load_ntu_course_website()
@@ -120,18 +150,27 @@ if __name__ == '__main__':
                 break
             print(f"Fetched {len(courses)} courses for semester {semester}, page index: {page_index}")
         os.makedirs('data', exist_ok=True)
-        with open(f'data/course_{semester}.json', 'w', encoding='utf-8') as f:
-            json.dump(total_courses, f, ensure_ascii=False, indent=4)
+        # Compact UTF-8 JSON; the files are only read back by scripts
+        with open(f'data/course_{semester}.json', 'wb') as f:
+            f.write(orjson.dumps(total_courses))
 
-    for semester in ['112-1', '112-2', '113-1', '113-2']:
-        courses = json.load(open(f'data/course_{semester}.json', 'r', encoding='utf-8'))
-        for course in tqdm(courses):
-            course_serial = course["serial"]
-            course_info = crawler.fetch_course_info(semester, course_serial)
-            course['info'] = course_info
-            os.makedirs('data', exist_ok=True)
+    with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as pool:
+        for semester in ['112-1', '112-2', '113-1', '113-2']:
+            with open(f'data/course_{semester}.json', 'rb') as f:
+                courses = orjson.loads(f.read())
             os.makedirs(f'data/{semester}', exist_ok=True)
-            with open(f'data/{semester}/{course_serial}.json', 'w', encoding='utf-8') as f:
-                json.dump(course, f, ensure_ascii=False, indent=4)
+            # Pages are fetched concurrently; results come back in course order. A page
+            # saved by an earlier run is reused instead of fetched, but every course
+            # file is rewritten so it carries this run's course-list fields
+            course_infos = pool.map(
+                lambda course: (load_saved_info(semester, course["serial"])
+                                or crawler.fetch_course_info(semester, course["serial"])),
+                courses
+            )
+            for course, course_info in tqdm(zip(courses, course_infos), total=len(courses)):
+                course_serial = course["serial"]
+                course['info'] = course_info
+                with open(f'data/{semester}/{course_serial}.json', 'wb') as f:
+                    f.write(orjson.dumps(course))
 
 # python3 -m tools.course_crawler